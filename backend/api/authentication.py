@@ -0,0 +1,102 @@
+from collections import namedtuple
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+# -------------------------------
+# Stateless JWT authentication (no User query per request)
+# -------------------------------
+UserState = namedtuple("UserState", ["username", "is_active", "is_staff", "is_superuser", "password_hash"])
+
+
+def _state_key(user_id):
+    return f"auth:user:{user_id}"
+
+
+def user_state(user_id):
+    """
+    Current UserState of `user_id` from the Django cache (AUTH_USER_CACHE_TTL
+    seconds), or None if the user does not exist. A miss costs one query.
+    """
+    key = _state_key(user_id)
+    state = cache.get(key)
+    if state is not None:
+        return state or None  # () caches "no such user"
+
+    row = (
+        User.objects
+        .filter(pk=user_id)
+        .values_list("username", "is_active", "is_staff", "is_superuser", "password")
+        .first()
+    )
+    state = UserState(*row[:4], get_md5_hash_password(row[4])) if row else ()
+    cache.set(key, state, timeout=settings.AUTH_USER_CACHE_TTL)
+    return state or None
+
+
+def forget_user_state(user_id):
+    """Drop the cached state of `user_id` (User saves and deletes, see api/signals.py)."""
+    cache.delete(_state_key(user_id))
+
+
+class CachedTokenUser(TokenUser):
+    """
+    TokenUser whose flags come from the cached UserState rather than the token,
+    so a deactivated or demoted user loses access without waiting for the
+    token to expire. Only `id`, `pk`, `username` and the flags are available:
+    views using it must query by `user.id`, never pass the object to the ORM.
+    """
+
+    def __init__(self, token, state):
+        super().__init__(token)
+        self.state = state
+
+    @cached_property
+    def username(self):
+        return self.state.username
+
+    @cached_property
+    def is_active(self):
+        return self.state.is_active
+
+    @cached_property
+    def is_staff(self):
+        return self.state.is_staff
+
+    @cached_property
+    def is_superuser(self):
+        return self.state.is_superuser
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    Drop-in for simplejwt's JWTAuthentication on high-frequency endpoints:
+    same token validation and the same user checks (exists, is_active,
+    CHECK_REVOKE_TOKEN), but against the cached UserState, and request.user
+    is a CachedTokenUser instead of a User loaded from the database.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        state = user_state(user_id)
+        if state is None:
+            raise AuthenticationFailed("User not found", code="user_not_found")
+        if api_settings.CHECK_USER_IS_ACTIVE and not state.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and \
+                validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != state.password_hash:
+            raise AuthenticationFailed("The user's password has been changed.", code="password_changed")
+
+        return CachedTokenUser(validated_token, state)
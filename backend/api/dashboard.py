@@ -0,0 +1,73 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+# -------------------------------
+# Dashboard section cache (short TTL, single-flight recompute, stale copy)
+# -------------------------------
+SECTIONS = ("stats", "weeklyRentals", "recentRentals")
+
+_WAIT_STEP = 0.05
+
+
+def _keys(section):
+    return f"dashboard:{section}:data", f"dashboard:{section}:gen", f"dashboard:{section}:lock"
+
+
+def get_section(section, build):
+    """
+    Return the cached value of a dashboard section, rebuilding it with `build()`
+    when it is older than DASHBOARD_CACHE_TTL or was invalidated.
+
+    Only one caller (per cache backend) rebuilds at a time; the others get the
+    previous copy, or wait for the rebuild if there is none. Entries carry the
+    generation they were built under, so a rebuild that raced with an
+    invalidation is never treated as fresh.
+    """
+    data_key, gen_key, lock_key = _keys(section)
+    values = cache.get_many([data_key, gen_key])
+    entry = values.get(data_key)
+    generation = values.get(gen_key, 0)
+
+    if entry is not None:
+        built_gen, built_at, value = entry
+        if built_gen == generation and time.time() - built_at < settings.DASHBOARD_CACHE_TTL:
+            return value
+
+    if not cache.add(lock_key, 1, timeout=settings.DASHBOARD_CACHE_LOCK_TIMEOUT):
+        if entry is not None:
+            return entry[2]
+        # Nothing to serve yet: wait for the caller holding the lock
+        deadline = time.monotonic() + settings.DASHBOARD_CACHE_LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(_WAIT_STEP)
+            entry = cache.get(data_key)
+            if entry is not None:
+                return entry[2]
+        return build()
+
+    try:
+        value = build()
+        cache.set(data_key, (generation, time.time(), value), timeout=settings.DASHBOARD_CACHE_STALE_TTL)
+        return value
+    finally:
+        cache.delete(lock_key)
+
+
+def _invalidate(sections):
+    for section in sections:
+        _, gen_key, _ = _keys(section)
+        if not cache.add(gen_key, 1, timeout=None):
+            try:
+                cache.incr(gen_key)
+            except ValueError:
+                cache.set(gen_key, 1, timeout=None)
+
+
+def invalidate_dashboard(*sections):
+    """Mark dashboard sections (default: all) stale once the current transaction commits."""
+    sections = sections or SECTIONS
+    transaction.on_commit(lambda: _invalidate(sections))
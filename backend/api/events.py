@@ -0,0 +1,133 @@
+import asyncio
+import json
+import threading
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import Bicycle
+
+
+# -------------------------------
+# Bicycle change feed for the SSE stream
+# -------------------------------
+_FIELDS = ("id", "device_id", "status", "latitude", "longitude", "last_update")
+
+
+def changed_bicycles(since, lookback=timedelta(0)):
+    """
+    Bikes changed after `since` (minus `lookback`), oldest change first. A change
+    is a newer last_update, or being marked offline (which keeps last_update).
+    """
+    since = since - lookback
+    return list(
+        Bicycle.objects.filter(Q(last_update__gt=since) | Q(offline_since__gt=since))
+        .annotate(changed_at=Greatest("last_update", Coalesce("offline_since", "last_update")))
+        .order_by("changed_at", "id")
+        .values(*_FIELDS, "changed_at")
+    )
+
+
+def format_event(bikes, event="bicycles"):
+    """One SSE frame; the event id is the newest changed_at, usable to resume."""
+    event_id = bikes[-1]["changed_at"].isoformat() if bikes else ""
+    data = json.dumps(bikes, cls=DjangoJSONEncoder)
+    return f"id: {event_id}\nevent: {event}\ndata: {data}\n\n"
+
+
+class BicycleChangeFeed:
+    """
+    Fans bicycle deltas out to the SSE subscribers of this process.
+
+    While at least one client is connected, a single task polls Bicycle for
+    rows whose last_update moved (an index range scan on last_update) every
+    `poll_interval` seconds, so the database cost is per process, not per
+    client. Polling the table rather than publishing from the write path
+    means changes made by any process (WSGI webhook workers included) reach
+    the stream. Rows are re-read `lookback` seconds back to catch
+    transactions that committed late, and only forwarded if newer than what
+    was already sent for that bike.
+    """
+
+    def __init__(self, poll_interval, lookback, queue_size):
+        self.poll_interval = poll_interval
+        self.lookback = timedelta(seconds=lookback)
+        self.queue_size = queue_size
+
+        self._subscribers = set()
+        self._task = None
+        self._cursor = None
+        self._sent = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        queue = asyncio.Queue(self.queue_size)
+        self._subscribers.add(queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    def _poll(self):
+        with self._lock:
+            first_poll = self._cursor is None
+            if first_poll:
+                self._cursor = timezone.now()
+
+            rows = changed_bicycles(self._cursor, self.lookback)
+            if first_poll:
+                # Changes from before the first subscriber are covered by Last-Event-ID replay
+                self._sent = {row["id"]: row["changed_at"] for row in rows}
+                rows = []
+
+            fresh = []
+            for row in rows:
+                if self._sent.get(row["id"]) != row["changed_at"]:
+                    self._sent[row["id"]] = row["changed_at"]
+                    fresh.append(row)
+            if rows:
+                self._cursor = max(self._cursor, rows[-1]["changed_at"])
+
+            # Forget bikes that fell out of the lookback window
+            horizon = self._cursor - self.lookback
+            self._sent = {pk: ts for pk, ts in self._sent.items() if ts > horizon}
+            return fresh
+
+    async def _run(self):
+        poll = sync_to_async(self._poll, thread_sensitive=False)
+        while self._subscribers:
+            try:
+                bikes = await poll()
+            except Exception as exc:
+                print(f"Bicycle change feed: poll failed: {exc}")
+                bikes = []
+
+            if bikes:
+                for queue in list(self._subscribers):
+                    try:
+                        queue.put_nowait(bikes)
+                    except asyncio.QueueFull:
+                        # Too slow to keep up: close it, the client reconnects and resumes
+                        self._subscribers.discard(queue)
+                        while not queue.empty():
+                            queue.get_nowait()
+                        queue.put_nowait(None)
+
+            await asyncio.sleep(self.poll_interval)
+
+        self._cursor = None
+        self._sent = {}
+
+
+change_feed = BicycleChangeFeed(
+    poll_interval=settings.BICYCLE_STREAM_POLL_INTERVAL,
+    lookback=settings.BICYCLE_STREAM_LOOKBACK,
+    queue_size=settings.BICYCLE_STREAM_QUEUE_SIZE,
+)
@@ -0,0 +1,101 @@
+import csv
+import json
+
+from asgiref.sync import sync_to_async
+
+
+# -------------------------------
+# Rental log export (streamed CSV / NDJSON)
+# -------------------------------
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+# Output column -> RentalLog lookup
+EXPORT_COLUMNS = {
+    "id": "id",
+    "user_id": "user_id",
+    "username": "user__username",
+    "email": "user__email",
+    "bicycle_id": "bicycle_id",
+    "device_id": "bicycle__device_id",
+    "start_time": "start_time",
+    "end_time": "end_time",
+    "duration_minutes": "duration_minutes",
+    "distance_km": "distance_km",
+    "status": "status",
+}
+
+
+class _Echo:
+    """File-like object whose write() returns the line instead of buffering it."""
+
+    def write(self, value):
+        return value
+
+
+def _rows(queryset, chunk_size):
+    rows = (
+        queryset
+        .order_by("start_time", "id")
+        .values_list(*EXPORT_COLUMNS.values())
+        .iterator(chunk_size=chunk_size)
+    )
+    for row in rows:
+        yield [value.isoformat() if hasattr(value, "isoformat") else value for value in row]
+
+
+def _batched(lines, chunk_size):
+    # One yield per chunk keeps the per-row overhead of the response iterator low
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= chunk_size:
+            yield "".join(batch)
+            batch = []
+    if batch:
+        yield "".join(batch)
+
+
+def _csv_lines(queryset, chunk_size):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(list(EXPORT_COLUMNS))
+    for row in _rows(queryset, chunk_size):
+        yield writer.writerow(row)
+
+
+def _ndjson_lines(queryset, chunk_size):
+    columns = list(EXPORT_COLUMNS)
+    for row in _rows(queryset, chunk_size):
+        yield json.dumps(dict(zip(columns, row))) + "\n"
+
+
+def export_rentals(queryset, output="csv", chunk_size=2000):
+    """
+    Generator of text chunks with every rental of `queryset`, oldest first.
+    Rows are read with a server-side cursor `chunk_size` at a time, so memory
+    use does not depend on how many rentals are exported.
+    """
+    lines = _csv_lines(queryset, chunk_size) if output == "csv" else _ndjson_lines(queryset, chunk_size)
+    return _batched(lines, chunk_size)
+
+
+async def aiter_chunks(chunks):
+    """
+    Async iterator over the sync generator `chunks`, for StreamingHttpResponse
+    under ASGI: given a sync iterator there, Django reads it to the end with
+    sync_to_async(list) before sending anything. Each chunk is pulled with its
+    own thread-sensitive hop, so the server-side cursor stays on the
+    request's thread and only one chunk is held in memory at a time.
+    """
+    pull = sync_to_async(next, thread_sensitive=True)
+    try:
+        while True:
+            chunk = await pull(chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        # Also on client disconnect: close the generator so its cursor is released
+        await sync_to_async(chunks.close, thread_sensitive=True)()
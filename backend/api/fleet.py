@@ -0,0 +1,24 @@
+import hashlib
+
+from django.db.models import Max
+
+from .models import Bicycle, BicycleTombstone
+
+
+# -------------------------------
+# Fleet version (ETag source for the bicycle list endpoints)
+# -------------------------------
+def fleet_version():
+    """
+    Opaque string that changes whenever any bike changes.
+
+    Derived from the database, so every process (web workers, sweeper
+    commands) sees the same value without a shared cache: the newest
+    last_update (position, heartbeat and status writes, new bikes), the
+    newest offline_since (bikes marked offline keep their last_update) and
+    the newest tombstone (deleted bikes). Each is one lookup on an index.
+    """
+    bikes = Bicycle.objects.aggregate(updated=Max("last_update"), offline=Max("offline_since"))
+    deleted = BicycleTombstone.objects.aggregate(last=Max("id"))["last"]
+    parts = (bikes["updated"], bikes["offline"], deleted)
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:16]
@@ -0,0 +1,156 @@
+import math
+
+import numpy as np
+
+
+EARTH_RADIUS_M = 6371000.0
+
+
+def approx_distance_m(lat1, lon1, lat2, lon2):
+    """
+    Equirectangular approximation of the distance in metres between two points.
+    Accurate to well under a metre at the few-hundred-metre scale it is used for.
+    """
+    mean_lat = math.radians((lat1 + lat2) / 2.0)
+    dx = math.radians(lon2 - lon1) * math.cos(mean_lat)
+    dy = math.radians(lat2 - lat1)
+    return EARTH_RADIUS_M * math.hypot(dx, dy)
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance in metres; works element-wise on NumPy arrays."""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2.0) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2.0) ** 2
+    return 2.0 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _segment_speeds(lat, lon, t):
+    distances = haversine_m(lat[:-1], lon[:-1], lat[1:], lon[1:])
+    # Uplinks sharing a timestamp are treated as one second apart
+    seconds = np.maximum(np.diff(t), 1.0)
+    return distances, distances / seconds
+
+
+def track_distance_km(lat, lon, t, max_speed_kmh):
+    """
+    Length of a GPS trace in kilometres.
+
+    `lat`/`lon` are degrees and `t` epoch seconds, as equally sized arrays sorted
+    by time. Glitches are filtered before summing:
+    - spikes, i.e. a single point that is too fast to reach and too fast to leave
+      while its neighbours are consistent with each other, are dropped;
+    - any remaining segment faster than `max_speed_kmh` (a teleport, e.g. after
+      a gap in coverage) is not counted.
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    t = np.asarray(t, dtype=float)
+    max_speed = max_speed_kmh / 3.6  # m/s
+
+    # A handful of passes removes runs of consecutive spikes as well
+    for _ in range(3):
+        if len(lat) < 3:
+            break
+        _, speeds = _segment_speeds(lat, lon, t)
+        bridge = haversine_m(lat[:-2], lon[:-2], lat[2:], lon[2:]) / np.maximum(t[2:] - t[:-2], 1.0)
+        spike = (speeds[:-1] > max_speed) & (speeds[1:] > max_speed) & (bridge <= max_speed)
+        if not spike.any():
+            break
+        keep = np.ones(len(lat), dtype=bool)
+        keep[1:-1] = ~spike
+        lat, lon, t = lat[keep], lon[keep], t[keep]
+
+    if len(lat) < 2:
+        return 0.0
+
+    distances, speeds = _segment_speeds(lat, lon, t)
+    return float(distances[speeds <= max_speed].sum() / 1000.0)
+
+
+class GridIndex:
+    """
+    Uniform lat/lon grid of points keyed by an id, for k-nearest lookups.
+
+    Points are bucketed into cells of `cell_deg` degrees; a query walks rings
+    of cells outwards from the query point and stops as soon as no unvisited
+    cell can hold anything closer than the k-th best candidate (or the radius),
+    so its cost depends on how many points are nearby, not on the total.
+    Not thread-safe by itself; callers serialise access.
+    """
+
+    def __init__(self, cell_deg):
+        self.cell_deg = cell_deg
+        self._cells = {}
+        self._points = {}
+
+    def __len__(self):
+        return len(self._points)
+
+    def _cell(self, lat, lon):
+        return (math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg))
+
+    def upsert(self, key, lat, lon, data=None):
+        self.remove(key)
+        cell = self._cell(lat, lon)
+        self._points[key] = (lat, lon, cell, data)
+        self._cells.setdefault(cell, set()).add(key)
+
+    def remove(self, key):
+        point = self._points.pop(key, None)
+        if point is None:
+            return
+        members = self._cells.get(point[2])
+        members.discard(key)
+        if not members:
+            del self._cells[point[2]]
+
+    def get(self, key):
+        point = self._points.get(key)
+        return None if point is None else (point[0], point[1], point[3])
+
+    def clear(self):
+        self._cells.clear()
+        self._points.clear()
+
+    def _ring(self, center, r):
+        ci, cj = center
+        if r == 0:
+            yield center
+            return
+        for dj in range(-r, r + 1):
+            yield (ci - r, cj + dj)
+            yield (ci + r, cj + dj)
+        for di in range(-r + 1, r):
+            yield (ci + di, cj - r)
+            yield (ci + di, cj + r)
+
+    def nearest(self, lat, lon, k, radius_m):
+        """Return up to k (key, distance_m, data) tuples within radius_m, closest first."""
+        if not self._points or k <= 0:
+            return []
+
+        # Smallest extent of one cell in metres (east-west shrinks with latitude)
+        lat_edge = min(abs(lat) + self.cell_deg, 90.0)
+        cell_m = (
+            math.radians(self.cell_deg) * EARTH_RADIUS_M * max(math.cos(math.radians(lat_edge)), 1e-6)
+        )
+        max_ring = int(math.ceil(radius_m / cell_m)) + 1
+
+        center = self._cell(lat, lon)
+        found = []
+        for r in range(max_ring + 1):
+            for cell in self._ring(center, r):
+                for key in self._cells.get(cell, ()):
+                    p_lat, p_lon, _, data = self._points[key]
+                    distance = approx_distance_m(lat, lon, p_lat, p_lon)
+                    if distance <= radius_m:
+                        found.append((key, distance, data))
+
+            # Anything in ring r+1 or beyond is at least r * cell_m away
+            if len(found) >= k:
+                found.sort(key=lambda item: item[1])
+                if found[k - 1][1] <= r * cell_m:
+                    break
+
+        found.sort(key=lambda item: item[1])
+        return found[:k]
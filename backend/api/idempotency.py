@@ -0,0 +1,95 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+
+# -------------------------------
+# Idempotency-Key support (stored responses replayed from the Django cache)
+# -------------------------------
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+_PENDING = "pending"
+_DONE = "done"
+
+
+def _digest(value):
+    return hashlib.sha256(value.encode()).hexdigest()
+
+
+def _fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return _digest(f"{request.method} {request.path} {body}")[:32]
+
+
+class IdempotencyMixin:
+    """
+    Lets clients retry a POST safely by sending an Idempotency-Key header.
+
+    The first request with a key stores a compact (state, fingerprint, status,
+    data) record in the Django cache; retries within IDEMPOTENCY_KEY_TTL seconds
+    get the stored response back (with Idempotent-Replayed: true) after one
+    cache lookup, without redoing any database work. Keys are scoped per user,
+    or by whatever idempotency_scope() returns for views without one.
+    """
+
+    def idempotency_scope(self, request):
+        """Namespace of the client's keys, so two clients never share one."""
+        return f"user:{request.user.id}"
+
+    def idempotent_response(self, request, build_response):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return build_response()
+        if len(key) > 255:
+            return Response(
+                {"error": f"'{IDEMPOTENCY_HEADER}' must be at most 255 characters."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        cache_key = f"idem:{self.idempotency_scope(request)}:{_digest(key)[:32]}"
+        fingerprint = _fingerprint(request)
+
+        # cache.add is atomic: exactly one request per key gets to run
+        if not cache.add(cache_key, (_PENDING, fingerprint, None, None),
+                         timeout=settings.IDEMPOTENCY_PENDING_TIMEOUT):
+            return self._replay(cache.get(cache_key), fingerprint, request, build_response)
+
+        try:
+            response = build_response()
+        except Exception:
+            cache.delete(cache_key)
+            raise
+
+        if response.status_code >= 500:
+            # Not a final answer: let the client retry for real
+            cache.delete(cache_key)
+        else:
+            cache.set(cache_key, (_DONE, fingerprint, response.status_code, response.data),
+                      timeout=settings.IDEMPOTENCY_KEY_TTL)
+        return response
+
+    def _replay(self, record, fingerprint, request, build_response):
+        if record is None:
+            # Expired between add() and get(): treat as a new request
+            return self.idempotent_response(request, build_response)
+
+        state, stored_fingerprint, stored_status, data = record
+        if stored_fingerprint != fingerprint:
+            return Response(
+                {"error": f"'{IDEMPOTENCY_HEADER}' was already used for a different request."},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        if state == _PENDING:
+            return Response(
+                {"error": "A request with this Idempotency-Key is still being processed."},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        response = Response(data, status=stored_status)
+        response[REPLAYED_HEADER] = "true"
+        return response
@@ -0,0 +1,223 @@
+import csv
+import io
+import json
+import os
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .dashboard import invalidate_dashboard
+from .models import UserImportJob, UserProfile
+from .passwords import hash_passwords
+from .rfid import rfid_tags
+
+
+# -------------------------------
+# Bulk user + RFID import (CSV / JSON)
+# -------------------------------
+IMPORT_FORMATS = ("csv", "json")
+IMPORT_COLUMNS = ("username", "password", "email", "rfid_tag")
+
+
+def parse_import(data, input_format):
+    """
+    Rows of an import file as a list of dicts. CSV needs a header row with
+    (a subset of) IMPORT_COLUMNS; JSON is a list of objects, or {"users": [...]}.
+    Raises ValueError if the file cannot be read at all.
+    """
+    if isinstance(data, bytes):
+        data = data.decode("utf-8-sig")
+
+    if input_format == "csv":
+        reader = csv.DictReader(io.StringIO(data))
+        if not reader.fieldnames or "username" not in reader.fieldnames:
+            raise ValueError("CSV must have a header row with at least a 'username' column.")
+        return list(reader)
+
+    try:
+        rows = json.loads(data) if isinstance(data, str) else data
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON: {e}")
+    if isinstance(rows, dict):
+        rows = rows.get("users")
+    if not isinstance(rows, list):
+        raise ValueError("JSON must be a list of users or {\"users\": [...]}.")
+    return rows
+
+
+def _clean(value):
+    value = "" if value is None else str(value).strip()
+    return value or None
+
+
+def count_passwords(rows):
+    """How many rows carry a password, i.e. how many slow hashes an import would compute."""
+    return sum(1 for row in rows if isinstance(row, dict) and _clean(row.get("password")))
+
+
+def _validate(rows):
+    """Split rows into (valid, errors); valid rows are (row number, username, password, email, rfid_tag)."""
+    valid, errors = [], []
+    usernames, tags = set(), set()
+    for number, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            errors.append({"row": number, "error": "Row must be an object."})
+            continue
+
+        username, password, email, rfid_tag = (_clean(row.get(column)) for column in IMPORT_COLUMNS)
+        error = None
+        if not username:
+            error = "'username' is required."
+        elif len(username) > 150:
+            error = "'username' must be at most 150 characters."
+        elif username in usernames:
+            error = f"Duplicate username '{username}' in this file."
+        elif rfid_tag and rfid_tag in tags:
+            error = f"Duplicate RFID tag '{rfid_tag}' in this file."
+        else:
+            try:
+                User.username_validator(username)
+            except ValidationError as e:
+                error = e.messages[0]
+
+        if error:
+            errors.append({"row": number, "username": username, "error": error})
+            continue
+        usernames.add(username)
+        if rfid_tag:
+            tags.add(rfid_tag)
+        valid.append((number, username, password, email or "", rfid_tag))
+    return valid, errors
+
+
+def _existing(field, values, chunk_size):
+    values = list(values)
+    found = set()
+    for i in range(0, len(values), chunk_size):
+        chunk = values[i:i + chunk_size]
+        if field == "username":
+            found.update(User.objects.filter(username__in=chunk).values_list("username", flat=True))
+        else:
+            found.update(UserProfile.objects.filter(rfid_tag__in=chunk).values_list("rfid_tag", flat=True))
+    return found
+
+
+def _create_chunk(chunk, hashes):
+    users = [
+        User(username=username, email=email, password=password_hash)
+        for (_, username, _, email, _), password_hash in zip(chunk, hashes)
+    ]
+    # bulk_create sends no post_save, so profiles are created here instead of
+    # by create_or_update_user_profile
+    with transaction.atomic():
+        users = User.objects.bulk_create(users)
+        UserProfile.objects.bulk_create([
+            UserProfile(user_id=user.pk, rfid_tag=rfid_tag)
+            for user, (_, _, _, _, rfid_tag) in zip(users, chunk)
+        ])
+
+
+def _create_one_by_one(chunk, hashes, errors):
+    # A row of the chunk clashed with a user or tag created concurrently: find which
+    created = 0
+    for row, password_hash in zip(chunk, hashes):
+        try:
+            _create_chunk([row], [password_hash])
+            created += 1
+        except IntegrityError:
+            errors.append({"row": row[0], "username": row[1],
+                           "error": "Username or RFID tag already exists."})
+    return created
+
+
+def import_users(rows, chunk_size=1000, workers=None, dry_run=False):
+    """
+    Create a user and profile for every valid row of `rows` (see parse_import).
+
+    Rows are validated up front (including against existing usernames and
+    RFID tags, one query per chunk), passwords are hashed in a process pool,
+    and users and profiles are inserted with bulk_create, one transaction per
+    chunk. Returns {"created": n, "errors": [{"row", "username", "error"}]}
+    with 1-based row numbers; invalid rows never block the valid ones.
+    """
+    workers = workers or os.cpu_count() or 1
+    valid, errors = _validate(rows)
+
+    taken_usernames = _existing("username", (row[1] for row in valid), chunk_size)
+    taken_tags = _existing("rfid_tag", (row[4] for row in valid if row[4]), chunk_size)
+    importable = []
+    for row in valid:
+        if row[1] in taken_usernames:
+            errors.append({"row": row[0], "username": row[1], "error": f"Username '{row[1]}' already exists."})
+        elif row[4] in taken_tags:
+            errors.append({"row": row[0], "username": row[1],
+                           "error": f"RFID tag '{row[4]}' is already assigned to another user."})
+        else:
+            importable.append(row)
+
+    errors.sort(key=lambda error: error["row"])
+    if dry_run or not importable:
+        return {"created": len(importable) if dry_run else 0, "errors": errors}
+
+    hashes = hash_passwords([row[2] for row in importable], workers)
+
+    created = 0
+    for i in range(0, len(importable), chunk_size):
+        chunk, chunk_hashes = importable[i:i + chunk_size], hashes[i:i + chunk_size]
+        try:
+            _create_chunk(chunk, chunk_hashes)
+            created += len(chunk)
+        except IntegrityError:
+            created += _create_one_by_one(chunk, chunk_hashes, errors)
+
+    # No User / UserProfile signals fired: do what api/signals.py would have done
+    invalidate_dashboard("stats")
+    for row in importable:
+        if row[4]:
+            rfid_tags.forget(None, row[4])
+
+    errors.sort(key=lambda error: error["row"])
+    return {"created": created, "errors": errors}
+
+
+# -------------------------------
+# Queued imports (hashed off the request path by `manage.py import_users --queued`)
+# -------------------------------
+def queue_import(rows, created_by=None):
+    """Store `rows` (see parse_import) as a pending UserImportJob."""
+    return UserImportJob.objects.create(created_by=created_by, rows=rows, total=len(rows))
+
+
+def run_next_import_job(chunk_size=1000, workers=None):
+    """
+    Claim the oldest pending UserImportJob and run it through import_users.
+    Returns the finished job, or None if nothing is pending.
+
+    The claim is a SKIP LOCKED select plus a status update in one transaction,
+    so several workers never run the same job. The rows, which hold plaintext
+    passwords, are emptied whether the job succeeds or fails.
+    """
+    with transaction.atomic():
+        job = (
+            UserImportJob.objects
+            .select_for_update(skip_locked=True)
+            .filter(status="pending")
+            .order_by("created_at")
+            .first()
+        )
+        if job is None:
+            return None
+        UserImportJob.objects.filter(pk=job.pk).update(status="running")
+
+    try:
+        result = import_users(job.rows, chunk_size=chunk_size, workers=workers)
+    except Exception as e:
+        job.status, job.errors = "failed", [{"row": None, "error": f"Import failed: {e}"}]
+    else:
+        job.status, job.created, job.errors = "done", result["created"], result["errors"]
+    job.rows = []
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "created", "errors", "rows", "finished_at"])
+    return job
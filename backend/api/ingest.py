@@ -0,0 +1,625 @@
+import atexit
+import math
+import queue
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Case, CharField, DateTimeField, F, FloatField, Q, Value, When
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .geo import approx_distance_m
+from .models import Bicycle, BicycleTelemetry
+from .registry import device_registry
+from .rides import _bikes_status_changed
+from .spatial import available_bikes
+
+
+# -------------------------------
+# EnthuTech uplink parsing & writes
+# -------------------------------
+Uplink = namedtuple("Uplink", ["device_id", "latitude", "longitude", "timestamp"])
+
+# An uplink from a bike marked offline (see mark_stale_offline) brings it back online
+_BACK_ONLINE = Case(
+    When(status="offline", then=Value("available")),
+    default=F("status"),
+    output_field=CharField(),
+)
+
+
+def parse_timestamp(value):
+    """
+    Parse an uplink timestamp given as ISO-8601 text or epoch seconds/milliseconds.
+    Returns an aware datetime, or None if the value cannot be understood.
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        if value > 1e12:  # epoch milliseconds
+            value = value / 1000.0
+        try:
+            return datetime.fromtimestamp(value, tz=dt_timezone.utc)
+        except (OverflowError, OSError, ValueError):
+            return None
+
+    if isinstance(value, str):
+        try:
+            parsed = parse_datetime(value)
+        except ValueError:
+            return None
+        if parsed is not None and timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed, dt_timezone.utc)
+        return parsed
+
+    return None
+
+
+def parse_uplink(data):
+    """
+    Validate a single EnthuTech uplink of the form
+    {"deviceID": "...", "payload": {"latitude": .., "longitude": .., "timestamp": ..}}.
+
+    The timestamp is optional (it may also sit next to deviceID); uplinks
+    without one are stamped with the time they were received.
+
+    Returns (uplink, None) on success or (None, error_message).
+    """
+    if not isinstance(data, dict):
+        return None, "Uplink must be an object"
+
+    device_id = data.get("deviceID")
+    payload = data.get("payload") or {}
+
+    if not device_id:
+        return None, "Missing deviceID"
+
+    if not isinstance(payload, dict):
+        return None, "Payload must be an object"
+
+    latitude = payload.get("latitude")
+    longitude = payload.get("longitude")
+
+    if latitude is None or longitude is None:
+        return None, "Payload must include 'latitude' and 'longitude'"
+
+    try:
+        latitude = float(latitude)
+        longitude = float(longitude)
+    except (TypeError, ValueError):
+        return None, "'latitude' and 'longitude' must be numbers"
+
+    # NaN/inf and out-of-range values would 500 the write (see BicycleTelemetry.to_fixed)
+    if not (math.isfinite(latitude) and math.isfinite(longitude)):
+        return None, "'latitude' and 'longitude' must be finite numbers"
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None, "'latitude' must be within ±90 and 'longitude' within ±180"
+
+    now = timezone.now()
+    raw_timestamp = payload.get("timestamp", data.get("timestamp"))
+    if raw_timestamp is None:
+        timestamp = now
+    else:
+        timestamp = parse_timestamp(raw_timestamp)
+        if timestamp is None:
+            return None, "Invalid 'timestamp'"
+        # A tracker with a clock running ahead must not block its own later uplinks
+        timestamp = min(timestamp, now)
+
+    return Uplink(device_id, latitude, longitude, timestamp), None
+
+
+def _write_positions(fresh, now):
+    """
+    Single UPDATE for {pk: uplink}. The WHERE clause re-checks position_at per
+    row, so an uplink never overwrites a newer position written concurrently
+    by another request, worker or process.
+    """
+    guard = Q(
+        *[
+            Q(pk=pk) & (Q(position_at__isnull=True) | Q(position_at__lte=uplink.timestamp))
+            for pk, uplink in fresh.items()
+        ],
+        _connector=Q.OR,
+    )
+
+    def case(attr, output_field):
+        return Case(
+            *[When(pk=pk, then=Value(getattr(uplink, attr))) for pk, uplink in fresh.items()],
+            output_field=output_field,
+        )
+
+    # .update() skips auto_now, so last_update is set explicitly
+    return Bicycle.objects.filter(guard).update(
+        latitude=case("latitude", FloatField()),
+        longitude=case("longitude", FloatField()),
+        position_at=case("timestamp", DateTimeField()),
+        status=_BACK_ONLINE,
+        offline_since=None,
+        last_update=now,
+    )
+
+
+def _positions_written(fresh):
+    """The part of {pk: uplink} whose position _write_positions actually stored."""
+    stored = dict(Bicycle.objects.filter(pk__in=fresh).values_list("pk", "position_at"))
+    return {pk: uplink for pk, uplink in fresh.items() if stored.get(pk) == uplink.timestamp}
+
+
+class WriteStats:
+    """Process-wide counters of position writes applied versus skipped as jitter."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {"applied": 0, "skipped": 0, "heartbeats": 0}
+
+    def add(self, applied=0, skipped=0, heartbeats=0):
+        with self._lock:
+            self._counters["applied"] += applied
+            self._counters["skipped"] += skipped
+            self._counters["heartbeats"] += heartbeats
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counters)
+
+
+write_stats = WriteStats()
+
+
+def _moved(position, uplink):
+    latitude, longitude = position
+    if latitude is None or longitude is None:
+        return True
+    distance = approx_distance_m(latitude, longitude, uplink.latitude, uplink.longitude)
+    return distance >= settings.WEBHOOK_MOVE_THRESHOLD_M
+
+
+def _telemetry_rows(uplinks, bikes):
+    return [
+        BicycleTelemetry(
+            bicycle_id=bikes[uplink.device_id].pk,
+            recorded_at=uplink.timestamp,
+            lat_e7=BicycleTelemetry.to_fixed(uplink.latitude),
+            lon_e7=BicycleTelemetry.to_fixed(uplink.longitude),
+        )
+        for uplink in uplinks
+        if uplink.device_id in bikes
+    ]
+
+
+def apply_uplinks(uplinks, trail=None):
+    """
+    Write a batch of parsed uplinks to Bicycle.
+
+    Device IDs are resolved through the in-process device registry (no query
+    once it is warm) and the changed rows are written by primary key with a
+    single UPDATE inside one transaction. Per device only the newest uplink
+    (by timestamp) is written, and never one older than the position already
+    stored.
+
+    Uplinks that moved less than WEBHOOK_MOVE_THRESHOLD_M from the stored
+    position are GPS jitter: the position is left alone and only last_update
+    is refreshed, at most once per WEBHOOK_HEARTBEAT_INTERVAL seconds.
+    Either write also sets a bike marked offline back to available.
+
+    Every uplink of a known device, including jitter and late arrivals, is
+    appended to BicycleTelemetry with one bulk insert in the same transaction
+    (when TELEMETRY_ENABLED). Callers that merged uplinks beforehand pass the
+    full, unmerged list as `trail` so history keeps every point.
+
+    Returns one {"deviceID", "status"} dict per uplink, in input order,
+    where status is "updated", "unchanged", "stale" or "not_found". The
+    status follows the rows actually written: an uplink the position_at
+    guard rejected is "stale" and its registry entry is re-read.
+    """
+    if not uplinks:
+        return []
+    if trail is None:
+        trail = uplinks
+
+    latest = {}
+    for uplink in uplinks:
+        current = latest.get(uplink.device_id)
+        if current is None or uplink.timestamp >= current.timestamp:
+            latest[uplink.device_id] = uplink
+
+    bikes = device_registry.get_many(set(latest) | {uplink.device_id for uplink in trail})
+
+    now = timezone.now()
+    heartbeat_cutoff = now - timedelta(seconds=settings.WEBHOOK_HEARTBEAT_INTERVAL)
+    fresh, jitter, heartbeat, revived = {}, {}, [], []
+    for device_id, uplink in latest.items():
+        entry = bikes.get(device_id)
+        if entry is None:
+            continue
+        if entry.position_at is not None and uplink.timestamp < entry.position_at:
+            continue
+        offline = entry.status == "offline"
+        if _moved((entry.latitude, entry.longitude), uplink):
+            fresh[entry.pk] = uplink
+            if offline:
+                revived.append((entry.pk, device_id, uplink.latitude, uplink.longitude))
+        else:
+            jitter[entry.pk] = uplink
+            if offline:
+                revived.append((entry.pk, device_id, entry.latitude, entry.longitude))
+            if offline or entry.last_update is None or entry.last_update < heartbeat_cutoff:
+                heartbeat.append(entry.pk)
+
+    telemetry = _telemetry_rows(trail, bikes) if settings.TELEMETRY_ENABLED else []
+
+    written = heartbeats = 0
+    if fresh or heartbeat or telemetry:
+        with transaction.atomic():
+            if fresh:
+                written = _write_positions(fresh, now)
+                if written < len(fresh):
+                    # The guard kept a newer position stored concurrently: those rows are stale
+                    kept = _positions_written(fresh)
+                    for pk in fresh.keys() - kept.keys():
+                        device_registry.saved(pk, fresh[pk].device_id)
+                    revived = [row for row in revived if row[0] in kept or row[0] in jitter]
+                    fresh = kept
+            if heartbeat:
+                heartbeats = Bicycle.objects.filter(
+                    Q(last_update__lt=heartbeat_cutoff) | Q(status="offline"), pk__in=heartbeat
+                ).update(status=_BACK_ONLINE, offline_since=None, last_update=now)
+            if telemetry:
+                BicycleTelemetry.objects.bulk_create(telemetry, batch_size=1000)
+
+    for pk, uplink in fresh.items():
+        device_registry.update(
+            uplink.device_id,
+            latitude=uplink.latitude,
+            longitude=uplink.longitude,
+            position_at=uplink.timestamp,
+            last_update=now,
+        )
+        available_bikes.moved(pk, uplink.latitude, uplink.longitude)
+    for pk in heartbeat:
+        device_registry.update(jitter[pk].device_id, last_update=now)
+    if revived:
+        _bikes_status_changed(revived, "available", now)
+
+    write_stats.add(applied=written, skipped=len(jitter), heartbeats=heartbeats)
+
+    applied = {uplink.device_id: uplink for uplink in fresh.values()}
+    unchanged = {uplink.device_id: uplink for uplink in jitter.values()}
+
+    def outcome(uplink):
+        if uplink.device_id not in bikes:
+            return "not_found"
+        if applied.get(uplink.device_id) is uplink:
+            return "updated"
+        if unchanged.get(uplink.device_id) is uplink:
+            return "unchanged"
+        return "stale"
+
+    return [{"deviceID": uplink.device_id, "status": outcome(uplink)} for uplink in uplinks]
+
+
+# -------------------------------
+# Offline detection
+# -------------------------------
+def mark_stale_offline(now=None, window=None, batch_size=1000, dry_run=False):
+    """
+    Mark available bikes not heard from for `window` seconds (default
+    DEVICE_OFFLINE_AFTER) as offline. Returns the number of bikes marked.
+
+    Each batch is a range scan on (status, last_update) that only visits
+    stale bikes, followed by one UPDATE by primary key that re-checks both
+    conditions, so a bike that sent an uplink in between is left alone.
+    last_update keeps the time the bike was last heard from; the change is
+    recorded in offline_since, which delta sync and the change feed read.
+    Bikes in use or reserved keep their status: the ride or reservation
+    decides when they are released. The next uplink of an offline bike
+    brings it back (see apply_uplinks).
+    """
+    now = now or timezone.now()
+    if window is None:
+        window = settings.DEVICE_OFFLINE_AFTER
+    cutoff = now - timedelta(seconds=window)
+    stale = Bicycle.objects.filter(status="available", last_update__lt=cutoff)
+    if dry_run:
+        return stale.count()
+
+    marked = 0
+    while True:
+        batch = list(
+            stale.order_by("last_update").values_list("id", "device_id", "latitude", "longitude")[:batch_size]
+        )
+        if not batch:
+            return marked
+        updated = Bicycle.objects.filter(
+            pk__in=[row[0] for row in batch], status="available", last_update__lt=cutoff
+        ).update(status="offline", offline_since=now)
+        rows = batch
+        if updated < len(batch):
+            # Some bikes were heard from (or changed) since the scan
+            marked_pks = set(Bicycle.objects.filter(
+                pk__in=[row[0] for row in batch], status="offline", offline_since=now
+            ).values_list("id", flat=True))
+            rows = [row for row in batch if row[0] in marked_pks]
+
+        _bikes_status_changed(rows, "offline")
+        marked += updated
+        if len(batch) < batch_size:
+            return marked
+
+
+# -------------------------------
+# Asynchronous ingest queue
+# -------------------------------
+class UplinkQueue:
+    """
+    Bounded in-process queue drained into Bicycle by a pool of worker threads.
+
+    Uplinks are written in batches of up to `batch_size`, or whatever has
+    arrived after `flush_interval` seconds. When the queue is full, put()
+    waits at most `put_timeout` seconds before rejecting, so callers can
+    push back on the sender instead of growing memory without bound.
+    """
+
+    def __init__(self, maxsize, batch_size, flush_interval, workers, put_timeout):
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.workers = workers
+        self.put_timeout = put_timeout
+
+        self._queue = queue.Queue(maxsize)
+        self._lock = threading.Lock()
+        self._threads = []
+        self._counters = {
+            "enqueued": 0,
+            "rejected": 0,
+            "applied": 0,
+            "unchanged": 0,
+            "not_found": 0,
+            "stale": 0,
+            "failed": 0,
+            "batches": 0,
+        }
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._counters[name] += n
+
+    def start(self):
+        """Start the worker threads once per process (lazily, so it is fork-safe)."""
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"uplink-drain-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            atexit.register(self.drain)
+
+    def put(self, uplinks):
+        """
+        Enqueue uplinks; returns how many were accepted. Anything after the
+        first uplink that could not be queued within put_timeout is rejected.
+        """
+        self.start()
+        accepted = 0
+        for uplink in uplinks:
+            try:
+                self._queue.put(uplink, timeout=self.put_timeout)
+            except queue.Full:
+                break
+            accepted += 1
+
+        self._count("enqueued", accepted)
+        self._count("rejected", len(uplinks) - accepted)
+        return accepted
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _apply(self, batch):
+        try:
+            return apply_uplinks(batch)
+        except Exception as exc:
+            if len(batch) == 1:
+                self._count("failed")
+                print(f"Uplink queue: failed to write uplink of {batch[0].device_id}: {exc}")
+                return []
+            print(f"Uplink queue: failed to write batch of {len(batch)}, retrying one by one: {exc}")
+
+        # One bad uplink must not take the rest of its batch down with it
+        results = []
+        for uplink in batch:
+            results.extend(self._apply([uplink]))
+        return results
+
+    def _write(self, batch):
+        close_old_connections()
+        try:
+            results = self._apply(batch)
+        finally:
+            close_old_connections()
+
+        for result in results:
+            self._count("applied" if result["status"] == "updated" else result["status"])
+        self._count("batches")
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def drain(self):
+        """Synchronously write whatever is still queued (used at shutdown)."""
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            try:
+                self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def metrics(self):
+        with self._lock:
+            counters = dict(self._counters)
+        return {
+            "depth": self._queue.qsize(),
+            "maxsize": self.maxsize,
+            "workers": len(self._threads),
+            **counters,
+        }
+
+
+_uplink_queue = None
+_uplink_queue_lock = threading.Lock()
+
+
+def get_uplink_queue():
+    """Process-wide UplinkQueue configured from the WEBHOOK_QUEUE_* settings."""
+    global _uplink_queue
+    if _uplink_queue is None:
+        with _uplink_queue_lock:
+            if _uplink_queue is None:
+                _uplink_queue = UplinkQueue(
+                    maxsize=settings.WEBHOOK_QUEUE_MAXSIZE,
+                    batch_size=settings.WEBHOOK_QUEUE_BATCH_SIZE,
+                    flush_interval=settings.WEBHOOK_QUEUE_FLUSH_INTERVAL,
+                    workers=settings.WEBHOOK_QUEUE_WORKERS,
+                    put_timeout=settings.WEBHOOK_QUEUE_PUT_TIMEOUT,
+                )
+    return _uplink_queue
+
+
+# -------------------------------
+# Last-write-wins coalescing buffer
+# -------------------------------
+class CoalescingBuffer:
+    """
+    Keeps only the newest uplink per device_id in memory and flushes the
+    merged set through apply_uplinks() every `flush_interval` seconds, or as
+    soon as `max_devices` distinct devices are pending.
+
+    An uplink older than the one already pending for its device does not
+    replace it; apply_uplinks() then guards against positions already stored
+    in the database. Every received uplink is still kept for the telemetry trail.
+    """
+
+    def __init__(self, max_devices, flush_interval):
+        self.max_devices = max_devices
+        self.flush_interval = flush_interval
+
+        self._pending = {}
+        self._trail = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._counters = {
+            "received": 0,
+            "merged": 0,
+            "stale": 0,
+            "flushes": 0,
+            "written": 0,
+            "failed": 0,
+        }
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="uplink-coalesce", daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def add(self, uplinks):
+        self.start()
+        with self._lock:
+            for uplink in uplinks:
+                self._counters["received"] += 1
+                self._trail.append(uplink)
+                current = self._pending.get(uplink.device_id)
+                if current is not None:
+                    if uplink.timestamp < current.timestamp:
+                        self._counters["stale"] += 1
+                        continue
+                    self._counters["merged"] += 1
+                self._pending[uplink.device_id] = uplink
+            full = len(self._pending) >= self.max_devices
+
+        if full:
+            self._wakeup.set()
+
+    def flush(self):
+        """Write the pending set now; returns the number of rows written."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            trail, self._trail = self._trail, []
+        if not pending:
+            return 0
+
+        close_old_connections()
+        try:
+            results = apply_uplinks(list(pending.values()), trail=trail)
+        except Exception as exc:
+            with self._lock:
+                self._counters["failed"] += len(pending)
+            print(f"Coalescing buffer: failed to flush {len(pending)} uplinks: {exc}")
+            return 0
+        finally:
+            close_old_connections()
+
+        written = sum(1 for r in results if r["status"] == "updated")
+        with self._lock:
+            self._counters["flushes"] += 1
+            self._counters["written"] += written
+            self._counters["stale"] += sum(1 for r in results if r["status"] == "stale")
+        return written
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def metrics(self):
+        with self._lock:
+            return {"pending": len(self._pending), "max_devices": self.max_devices, **self._counters}
+
+
+_coalescing_buffer = None
+
+
+def get_coalescing_buffer():
+    """Process-wide CoalescingBuffer configured from the WEBHOOK_COALESCE_* settings."""
+    global _coalescing_buffer
+    if _coalescing_buffer is None:
+        with _uplink_queue_lock:
+            if _coalescing_buffer is None:
+                _coalescing_buffer = CoalescingBuffer(
+                    max_devices=settings.WEBHOOK_COALESCE_MAX_DEVICES,
+                    flush_interval=settings.WEBHOOK_COALESCE_FLUSH_INTERVAL,
+                )
+    return _coalescing_buffer
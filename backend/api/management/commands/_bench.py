@@ -0,0 +1,71 @@
+"""Helpers shared by the benchmark commands (not a command itself)."""
+import random
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+
+from api.models import Bicycle, RentalLog
+from api.rollups import rebuild_rollups
+
+
+class Rollback(Exception):
+    """Raised at the end of a benchmark to undo everything it seeded."""
+
+
+def seed_history(now, rentals, bikes, users, days, batch_size=10000, stdout=None):
+    """
+    Bulk-insert `users` users, `bikes` bikes and `rentals` completed rentals spread
+    over the last `days` days, plus one ongoing ride on ~1% of the bikes. Call it
+    inside a transaction that is rolled back. Returns (users, bikes).
+    """
+    rng = random.Random(42)
+    tag = f"bench{int(now.timestamp())}"
+
+    user_objs = User.objects.bulk_create(
+        [User(username=f"{tag}_u{i}", email=f"{tag}_u{i}@example.com", is_active=True) for i in range(users)],
+        batch_size=batch_size,
+    )
+    statuses = ["available", "available", "available", "in_use", "offline"]
+    bike_objs = Bicycle.objects.bulk_create(
+        [Bicycle(device_id=f"{tag}_d{i}", status=rng.choice(statuses)) for i in range(bikes)],
+        batch_size=batch_size,
+    )
+
+    # start_time is auto_now_add; switch that off while seeding so history spreads over `days`
+    start_field = RentalLog._meta.get_field("start_time")
+    start_field.auto_now_add = False
+    try:
+        history = days * 86400
+        created = 0
+        while created < rentals:
+            n = min(batch_size, rentals - created)
+            rows = []
+            for _ in range(n):
+                start = now - timedelta(seconds=rng.randrange(history))
+                rows.append(RentalLog(
+                    user=rng.choice(user_objs),
+                    bicycle=rng.choice(bike_objs),
+                    start_time=start,
+                    end_time=start + timedelta(minutes=20),
+                    duration_minutes=20.0,
+                    distance_km=round(rng.uniform(0.5, 6.0), 3),
+                    status="completed",
+                ))
+            RentalLog.objects.bulk_create(rows)
+            created += n
+
+        # At most one ongoing ride per user and per bike
+        ongoing = max(1, min(bikes, users) // 100)
+        RentalLog.objects.bulk_create([
+            RentalLog(user=user_objs[i], bicycle=bike_objs[i], start_time=now - timedelta(minutes=10), status="ongoing")
+            for i in range(ongoing)
+        ])
+    finally:
+        start_field.auto_now_add = True
+
+    # bulk_create bypasses the incremental rollup maintenance
+    rebuild_rollups()
+
+    if stdout is not None:
+        stdout.write(f"Seeded {users} users, {bikes} bikes, {rentals} rentals over {days} days.")
+    return user_objs, bike_objs
@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
+from django.db.models import Q
 from api.models import Bicycle, RentalLog  # your app models
 from django.utils import timezone
 import random
@@ -103,6 +104,11 @@ class Command(BaseCommand):
             if RentalLog.objects.filter(user=user, bicycle=bicycle).exists():
                 continue
 
+            # Only one ongoing rental per user / bike is allowed
+            rental_status = random.choice(['completed', 'ongoing'])
+            if RentalLog.objects.filter(Q(user=user) | Q(bicycle=bicycle), status='ongoing').exists():
+                rental_status = 'completed'
+
             start_time = timezone.now() - timezone.timedelta(hours=random.randint(1, 10))
             end_time = start_time + timezone.timedelta(minutes=random.randint(10, 60))
 
@@ -113,7 +119,7 @@ class Command(BaseCommand):
                 end_time=end_time,
                 duration_minutes=(end_time - start_time).total_seconds() / 60,
                 distance_km=round(random.uniform(0.5, 4.5), 2),
-                status=random.choice(['completed', 'ongoing'])
+                status=rental_status
             )
             self.stdout.write(self.style.SUCCESS(f"✅ Log added: {user.username} → {bicycle.device_id}"))
 
@@ -0,0 +1,80 @@
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from api.models import Bicycle, RentalLog
+from api.views import DashboardView
+
+from ._bench import Rollback, seed_history
+
+
+def legacy_dashboard(now):
+    """The previous DashboardView body: five COUNT queries plus a Python weekday loop."""
+    stats = {
+        "totalBikes": Bicycle.objects.count(),
+        "available": Bicycle.objects.filter(status='available').count(),
+        "ongoingRentals": RentalLog.objects.filter(status__iexact='ongoing').count(),
+        "offline": Bicycle.objects.filter(status='offline').count(),
+        "activeUsers": User.objects.filter(is_active=True, is_staff=False).count(),
+    }
+    start_date = (now - timedelta(days=6)).date()
+    weekday_counts = {i: 0 for i in range(7)}
+    for r in RentalLog.objects.filter(start_time__date__gte=start_date, start_time__date__lte=now.date()):
+        weekday_counts[r.start_time.weekday()] += 1
+    return stats, weekday_counts
+
+
+def current_dashboard(now):
+    return DashboardView.build_stats(), DashboardView.build_weekly_rentals(now)
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the dashboard stats/weekly-histogram queries against a synthetic "
+        "rental history. All seeded rows are rolled back at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rentals", type=int, default=1_000_000)
+        parser.add_argument("--bikes", type=int, default=500)
+        parser.add_argument("--users", type=int, default=2000)
+        parser.add_argument("--days", type=int, default=365,
+                            help="Spread rental start times over this many days of history.")
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--batch-size", type=int, default=10000)
+        parser.add_argument("--skip-legacy", action="store_true",
+                            help="Only time the current implementation.")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                now = timezone.now()
+                seed_history(now, options["rentals"], options["bikes"], options["users"], options["days"],
+                             batch_size=options["batch_size"], stdout=self.stdout)
+                if not options["skip_legacy"]:
+                    self._run("legacy", legacy_dashboard, now, options)
+                self._run("current", current_dashboard, now, options)
+                raise Rollback
+        except Rollback:
+            self.stdout.write("Seeded rows rolled back.")
+
+    def _run(self, label, fn, now, options):
+        timings = []
+        queries = 0
+        for _ in range(options["repeat"]):
+            with CaptureQueriesContext(connection) as ctx:
+                began = time.perf_counter()
+                fn(now)
+                timings.append((time.perf_counter() - began) * 1000)
+            queries = len(ctx.captured_queries)
+
+        timings.sort()
+        self.stdout.write(self.style.SUCCESS(
+            f"{label:>8}: {queries} queries, median {timings[len(timings) // 2]:.1f} ms, "
+            f"min {timings[0]:.1f} ms over {options['repeat']} runs"
+        ))
@@ -0,0 +1,64 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from api.models import RentalLog
+from api.serializers import RentalLogSerializer, flatten_rentals, rental_rows
+
+from ._bench import Rollback, seed_history
+
+
+def serializer_path(queryset, limit):
+    rentals = queryset.select_related("user", "bicycle").order_by("-start_time", "-id")[:limit]
+    return RentalLogSerializer(rentals, many=True).data
+
+
+def flat_path(queryset, limit):
+    rows = rental_rows(queryset.order_by("-start_time", "-id")[:limit])
+    return flatten_rentals(rows)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare RentalLogSerializer with the flat values() rental rows on listings "
+        "of --sizes rows (fetch + serialization). All seeded rows are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="10000,100000",
+                            help="Comma-separated listing sizes to time.")
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options["sizes"].split(",")]
+        try:
+            with transaction.atomic():
+                seed_history(timezone.now(), max(sizes), bikes=500, users=2000, days=365, stdout=self.stdout)
+                queryset = RentalLog.objects.all()
+
+                # Both paths must render the same JSON
+                sample = min(sizes)
+                if json.dumps(serializer_path(queryset, sample)) != json.dumps(flat_path(queryset, sample)):
+                    self.stderr.write(self.style.ERROR("Flat rows differ from RentalLogSerializer output!"))
+
+                for size in sizes:
+                    slow = self._time(serializer_path, queryset, size, options["repeat"])
+                    fast = self._time(flat_path, queryset, size, options["repeat"])
+                    self.stdout.write(self.style.SUCCESS(
+                        f"{size:>8} rows: serializer {slow:8.1f} ms ({size / slow * 1000:>9,.0f} rows/s) | "
+                        f"flat {fast:8.1f} ms ({size / fast * 1000:>9,.0f} rows/s) | {slow / fast:.1f}x"
+                    ))
+                raise Rollback
+        except Rollback:
+            self.stdout.write("Seeded rows rolled back.")
+
+    def _time(self, fn, queryset, size, repeat):
+        timings = []
+        for _ in range(repeat):
+            began = time.perf_counter()
+            fn(queryset, size)
+            timings.append((time.perf_counter() - began) * 1000)
+        return min(timings)
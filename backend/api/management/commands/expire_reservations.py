@@ -0,0 +1,47 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from api.reservations import expire_due_reservations, next_expiry
+
+
+class Command(BaseCommand):
+    help = (
+        "Expire pending reservations past their expiry_at and release their bikes, "
+        "in batched UPDATEs. With --loop, keeps running and wakes at the next expiry "
+        "(or every --interval seconds, whichever comes first)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Run until interrupted.")
+        parser.add_argument("--interval", type=float, default=settings.RESERVATION_SWEEP_INTERVAL,
+                            help="Longest sleep between sweeps in --loop mode, in seconds.")
+        parser.add_argument("--batch-size", type=int, default=settings.RESERVATION_SWEEP_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if not options["loop"]:
+            expired = expire_due_reservations(batch_size=options["batch_size"])
+            self.stdout.write(self.style.SUCCESS(f"✅ Expired {expired} reservations."))
+            return
+
+        self.stdout.write(f"Sweeping expired reservations (at most every {options['interval']}s)...")
+        try:
+            while True:
+                expired = expire_due_reservations(batch_size=options["batch_size"])
+                if expired:
+                    self.stdout.write(self.style.SUCCESS(f"✅ Expired {expired} reservations."))
+                time.sleep(self._until_next(options["interval"]))
+        except KeyboardInterrupt:
+            self.stdout.write("Stopped.")
+        finally:
+            connection.close()
+
+    def _until_next(self, interval):
+        # Reservations created later expire later, so the earliest pending one is the next deadline
+        upcoming = next_expiry()
+        if upcoming is None:
+            return interval
+        return min(interval, max((upcoming - timezone.now()).total_seconds(), 0.05))
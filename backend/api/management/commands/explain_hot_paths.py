@@ -0,0 +1,79 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from api.models import Bicycle, RentalLog, UserProfile
+
+from ._bench import Rollback, seed_history
+
+
+# Indexes / partial unique indexes added for the hot paths (migrations 0010, 0011 and 0013)
+HOT_PATH_INDEXES = [
+    "bicycle_status_seen_idx",
+    "rental_start_time_idx",
+    "rental_user_start_idx",
+    "profile_rfid_tag_uniq",
+    "rental_one_ongoing_per_user",
+    "rental_one_ongoing_per_bicycle",
+]
+
+
+def hot_queries(user_id, tag, now):
+    return {
+        "ongoing ride check": RentalLog.objects.filter(user_id=user_id, status="ongoing"),
+        "ride history page": RentalLog.objects.filter(user_id=user_id).order_by("-start_time", "-id")[:50],
+        "admin log page": RentalLog.objects.order_by("-start_time", "-id")[:50],
+        "rentals in last 7 days": RentalLog.objects.filter(start_time__gte=now - timezone.timedelta(days=7)),
+        "available bikes": Bicycle.objects.filter(status="available"),
+        "RFID lookup": UserProfile.objects.filter(rfid_tag=tag),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Print EXPLAIN plans of the rental/fleet hot queries with and without the "
+        "hot-path indexes, on a synthetic history. Everything is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rentals", type=int, default=100_000)
+        parser.add_argument("--bikes", type=int, default=500)
+        parser.add_argument("--users", type=int, default=5000)
+        parser.add_argument("--days", type=int, default=365)
+        parser.add_argument("--analyze", action="store_true",
+                            help="Run EXPLAIN ANALYZE (PostgreSQL) to include actual timings.")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                now = timezone.now()
+                users, _ = seed_history(now, options["rentals"], options["bikes"], options["users"],
+                                        options["days"], stdout=self.stdout)
+                UserProfile.objects.bulk_create([
+                    UserProfile(user=user, rfid_tag=f"RFID{user.pk:08d}" if i % 2 == 0 else None)
+                    for i, user in enumerate(users)
+                ])
+                queries = hot_queries(users[0].pk, f"RFID{users[0].pk:08d}", now)
+
+                self._analyze_tables()
+                self._explain("WITH hot-path indexes", queries, options)
+
+                with connection.cursor() as cursor:
+                    for name in HOT_PATH_INDEXES:
+                        cursor.execute(f"DROP INDEX {connection.ops.quote_name(name)}")
+                self._analyze_tables()
+                self._explain("WITHOUT hot-path indexes", queries, options)
+                raise Rollback
+        except Rollback:
+            self.stdout.write("Seeded rows and dropped indexes rolled back.")
+
+    def _analyze_tables(self):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def _explain(self, title, queries, options):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n=== {title} ==="))
+        explain_options = {"analyze": True} if options["analyze"] and connection.vendor == "postgresql" else {}
+        for label, queryset in queries.items():
+            self.stdout.write(self.style.SUCCESS(f"\n-- {label}"))
+            self.stdout.write(queryset.explain(**explain_options))
@@ -0,0 +1,48 @@
+import sys
+from datetime import date, datetime, time, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api.exports import EXPORT_FORMATS, export_rentals
+from api.models import RentalLog
+
+
+def _day(value, name):
+    try:
+        return timezone.make_aware(datetime.combine(date.fromisoformat(value), time.min))
+    except ValueError:
+        raise CommandError(f"--{name} must be a date in YYYY-MM-DD format.")
+
+
+class Command(BaseCommand):
+    help = "Stream rental logs (oldest first) as CSV or NDJSON to a file or stdout."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", choices=sorted(EXPORT_FORMATS), default="csv")
+        parser.add_argument("--status", choices=["ongoing", "completed"])
+        parser.add_argument("--from", dest="start", help="First start day to include (YYYY-MM-DD).")
+        parser.add_argument("--to", dest="end", help="Last start day to include (YYYY-MM-DD).")
+        parser.add_argument("--file", help="Write to this path instead of stdout.")
+        parser.add_argument("--chunk-size", type=int, default=settings.RENTAL_EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        rentals = RentalLog.objects.all()
+        if options["status"]:
+            rentals = rentals.filter(status=options["status"])
+        if options["start"]:
+            rentals = rentals.filter(start_time__gte=_day(options["start"], "from"))
+        if options["end"]:
+            rentals = rentals.filter(start_time__lt=_day(options["end"], "to") + timedelta(days=1))
+
+        out = open(options["file"], "w", newline="", encoding="utf-8") if options["file"] else sys.stdout
+        try:
+            for chunk in export_rentals(rentals, output=options["output"], chunk_size=options["chunk_size"]):
+                out.write(chunk)
+        finally:
+            if options["file"]:
+                out.close()
+
+        if options["file"]:
+            self.stderr.write(self.style.SUCCESS(f"✅ Exported rentals to {options['file']}."))
@@ -0,0 +1,83 @@
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from api.imports import IMPORT_FORMATS, import_users, parse_import, run_next_import_job
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-create users (and their RFID tags) from a CSV file with a "
+        "username,password,email,rfid_tag header, or a JSON list of such objects. "
+        "Rows with errors are reported and skipped. With --queued instead of a file, "
+        "runs the imports queued by POST /api/users/import/ (--loop: keep polling)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="?")
+        parser.add_argument("--input", choices=IMPORT_FORMATS,
+                            help="File format (default: from the file extension, else csv).")
+        parser.add_argument("--chunk-size", type=int, default=settings.USER_IMPORT_CHUNK_SIZE)
+        parser.add_argument("--workers", type=int, default=settings.USER_IMPORT_WORKERS,
+                            help="Processes hashing passwords (0 = one per CPU).")
+        parser.add_argument("--dry-run", action="store_true", help="Validate only; create nothing.")
+        parser.add_argument("--queued", action="store_true", help="Run the queued import jobs.")
+        parser.add_argument("--loop", action="store_true", help="With --queued: run until interrupted.")
+        parser.add_argument("--interval", type=float, default=settings.USER_IMPORT_POLL_INTERVAL,
+                            help="Sleep between polls for queued jobs in --loop mode, in seconds.")
+
+    def handle(self, *args, **options):
+        if options["queued"]:
+            return self._run_queued(options)
+        if not options["path"]:
+            raise CommandError("Give the file to import, or --queued.")
+
+        path = Path(options["path"])
+        input_format = options["input"] or ("json" if path.suffix.lower() == ".json" else "csv")
+        try:
+            rows = parse_import(path.read_bytes(), input_format)
+        except (OSError, ValueError, UnicodeDecodeError) as e:
+            raise CommandError(str(e))
+
+        began = time.perf_counter()
+        result = import_users(rows, chunk_size=options["chunk_size"], workers=options["workers"],
+                              dry_run=options["dry_run"])
+        elapsed = time.perf_counter() - began
+
+        for error in result["errors"]:
+            self.stderr.write(f"Row {error['row']} ({error.get('username') or '-'}): {error['error']}")
+        verb = "Would import" if options["dry_run"] else "Imported"
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {verb} {result['created']} of {len(rows)} users in {elapsed:.1f}s "
+            f"({len(result['errors'])} rows with errors)."
+        ))
+
+    def _run_queued(self, options):
+        if options["loop"]:
+            self.stdout.write(f"Running queued user imports (polling every {options['interval']}s)...")
+        try:
+            while True:
+                while self._run_one(options):
+                    pass
+                if not options["loop"]:
+                    return
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            self.stdout.write("Stopped.")
+        finally:
+            connection.close()
+
+    def _run_one(self, options):
+        began = time.perf_counter()
+        job = run_next_import_job(chunk_size=options["chunk_size"], workers=options["workers"])
+        if job is None:
+            return False
+        elapsed = time.perf_counter() - began
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Import {job.id} {job.status}: {job.created} of {job.total} users in {elapsed:.1f}s "
+            f"({len(job.errors)} rows with errors)."
+        ))
+        return True
@@ -0,0 +1,120 @@
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+from django.utils import timezone
+
+from api.models import Bicycle, BicycleTombstone, RentalLog
+from api.rides import RideError, complete_ride, start_ride
+
+
+class Command(BaseCommand):
+    help = (
+        "Concurrent load test of ride start/complete: --workers threads race for "
+        "--bikes bikes. Verifies that no bike or user ever has two ongoing rentals "
+        "and reports throughput. Test rows are deleted afterwards unless --keep."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=16)
+        parser.add_argument("--users", type=int, default=200)
+        parser.add_argument("--bikes", type=int, default=20,
+                            help="Fewer bikes than users forces contention on the same rows.")
+        parser.add_argument("--rides", type=int, default=10, help="Ride attempts per user.")
+        parser.add_argument("--keep", action="store_true", help="Keep the test users, bikes and rentals.")
+
+    def handle(self, *args, **options):
+        tag = f"load{int(time.time())}"
+        users = User.objects.bulk_create(
+            [User(username=f"{tag}_u{i}") for i in range(options["users"])]
+        )
+        bikes = Bicycle.objects.bulk_create(
+            [Bicycle(device_id=f"{tag}_d{i}", status="available") for i in range(options["bikes"])]
+        )
+        device_ids = [bike.device_id for bike in bikes]
+
+        outcomes = Counter()
+        lock = threading.Lock()
+
+        def rider(user):
+            rng = random.Random(user.pk)
+            local = Counter()
+            try:
+                for _ in range(options["rides"]):
+                    try:
+                        started = start_ride(user, rng.choice(device_ids))
+                    except RideError as e:
+                        local[f"start {e.status_code}"] += 1
+                        continue
+                    local["started"] += 1
+                    try:
+                        complete_ride(user, started["rental_id"])
+                        local["completed"] += 1
+                    except RideError as e:
+                        local[f"complete {e.status_code}"] += 1
+            except Exception as e:  # e.g. "database is locked" on SQLite
+                local[f"error {type(e).__name__}"] += 1
+            finally:
+                connection.close()
+                with lock:
+                    outcomes.update(local)
+
+        began = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+            list(pool.map(rider, users))
+        elapsed = time.perf_counter() - began
+
+        ops = outcomes["started"] + outcomes["completed"]
+        self.stdout.write(f"Outcomes: {dict(sorted(outcomes.items()))}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{ops} successful start/complete operations in {elapsed:.2f}s "
+            f"({ops / elapsed:.0f} ops/s, {options['workers']} workers)"
+        ))
+
+        self._check(tag, bikes)
+
+        if not options["keep"]:
+            RentalLog.objects.filter(bicycle__in=bikes).delete()
+            Bicycle.objects.filter(pk__in=[bike.pk for bike in bikes]).delete()
+            BicycleTombstone.objects.filter(device_id__startswith=f"{tag}_").delete()
+            User.objects.filter(pk__in=[user.pk for user in users]).delete()
+
+    def _check(self, tag, bikes):
+        rentals = RentalLog.objects.filter(bicycle__in=bikes)
+        double_bike = rentals.filter(status="ongoing").values("bicycle").annotate(n=Count("id")).filter(n__gt=1)
+        double_user = rentals.filter(status="ongoing").values("user").annotate(n=Count("id")).filter(n__gt=1)
+        # Every completed ride leaves the bike available again; an in_use bike must have exactly one ongoing ride
+        orphaned = Bicycle.objects.filter(device_id__startswith=f"{tag}_", status="in_use").exclude(
+            rentallog__status="ongoing"
+        )
+        overlapping = self._overlaps(rentals)
+
+        problems = {
+            "bikes with >1 ongoing rental": double_bike.count(),
+            "users with >1 ongoing rental": double_user.count(),
+            "in_use bikes without a ride": orphaned.count(),
+            "overlapping rentals of one bike": overlapping,
+        }
+        for label, count in problems.items():
+            style = self.style.SUCCESS if count == 0 else self.style.ERROR
+            self.stdout.write(style(f"{label}: {count}"))
+
+    def _overlaps(self, rentals):
+        # A bike's rentals, ordered by start, must never start before the previous one ended
+        overlaps = 0
+        last = {}
+        now = timezone.now()
+        for bike_id, start, end in rentals.order_by("bicycle_id", "start_time").values_list(
+            "bicycle_id", "start_time", "end_time"
+        ):
+            previous_end = last.get(bike_id)
+            if previous_end is not None and start < previous_end:
+                overlaps += 1
+            last[bike_id] = end or now
+        return overlaps
@@ -0,0 +1,41 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from api.ingest import mark_stale_offline
+
+
+class Command(BaseCommand):
+    help = (
+        "Mark available bikes whose last uplink is older than --window seconds as offline. "
+        "With --loop, repeats every --interval seconds."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--window", type=int, default=settings.DEVICE_OFFLINE_AFTER,
+                            help="Seconds without an uplink after which a bike is offline.")
+        parser.add_argument("--loop", action="store_true", help="Run until interrupted.")
+        parser.add_argument("--interval", type=float, default=settings.DEVICE_OFFLINE_SWEEP_INTERVAL)
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        verb = "Would mark" if options["dry_run"] else "Marked"
+        try:
+            while True:
+                marked = mark_stale_offline(
+                    window=options["window"], batch_size=options["batch_size"], dry_run=options["dry_run"]
+                )
+                if marked or not options["loop"]:
+                    self.stdout.write(self.style.SUCCESS(
+                        f"✅ {verb} {marked} bikes offline (no uplink for {options['window']}s)."
+                    ))
+                if not options["loop"]:
+                    return
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            self.stdout.write("Stopped.")
+        finally:
+            connection.close()
@@ -0,0 +1,88 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import Bicycle, BicycleTelemetry
+
+
+class Command(BaseCommand):
+    help = (
+        "Apply telemetry retention: delete points older than --days and downsample "
+        "points older than --downsample-after days to one per --bucket-seconds per bike."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=settings.TELEMETRY_RETENTION_DAYS,
+                            help="Delete telemetry older than this many days.")
+        parser.add_argument("--downsample-after", type=int, default=settings.TELEMETRY_DOWNSAMPLE_AFTER_DAYS,
+                            help="Downsample telemetry older than this many days.")
+        parser.add_argument("--window", type=int, default=2,
+                            help="How many days before --downsample-after to downsample on this run "
+                                 "(run daily, so older days are already downsampled).")
+        parser.add_argument("--bucket-seconds", type=int, default=settings.TELEMETRY_DOWNSAMPLE_SECONDS,
+                            help="Keep the first point of every bucket of this many seconds.")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        retention_cutoff = now - timedelta(days=options["days"])
+        downsample_end = now - timedelta(days=options["downsample_after"])
+        downsample_start = max(retention_cutoff, downsample_end - timedelta(days=options["window"]))
+
+        # Work per bike so every statement is a range scan on (bicycle, recorded_at)
+        bike_ids = list(Bicycle.objects.order_by("id").values_list("id", flat=True))
+
+        deleted = 0
+        downsampled = 0
+        for bike_id in bike_ids:
+            deleted += self._delete_before(bike_id, retention_cutoff, options)
+            if downsample_start < downsample_end:
+                downsampled += self._downsample(bike_id, downsample_start, downsample_end, options)
+
+        verb = "Would remove" if options["dry_run"] else "Removed"
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {verb} {deleted} expired and {downsampled} downsampled telemetry points "
+            f"across {len(bike_ids)} bikes."
+        ))
+
+    def _delete_in_batches(self, ids, options):
+        if options["dry_run"]:
+            return len(ids)
+        batch_size = options["batch_size"]
+        for i in range(0, len(ids), batch_size):
+            BicycleTelemetry.objects.filter(id__in=ids[i:i + batch_size]).delete()
+        return len(ids)
+
+    def _delete_before(self, bike_id, cutoff, options):
+        expired = BicycleTelemetry.objects.filter(bicycle_id=bike_id, recorded_at__lt=cutoff)
+        if options["dry_run"]:
+            return expired.count()
+
+        total = 0
+        while True:
+            ids = list(expired.order_by("recorded_at").values_list("id", flat=True)[:options["batch_size"]])
+            if not ids:
+                return total
+            total += self._delete_in_batches(ids, options)
+
+    def _downsample(self, bike_id, start, end, options):
+        bucket_seconds = options["bucket_seconds"]
+        points = (
+            BicycleTelemetry.objects
+            .filter(bicycle_id=bike_id, recorded_at__gte=start, recorded_at__lt=end)
+            .order_by("recorded_at", "id")
+            .values_list("id", "recorded_at")
+        )
+
+        drop = []
+        last_bucket = None
+        for point_id, recorded_at in points.iterator(chunk_size=options["batch_size"]):
+            bucket = int(recorded_at.timestamp()) // bucket_seconds
+            if bucket == last_bucket:
+                drop.append(point_id)
+            last_bucket = bucket
+
+        return self._delete_in_batches(drop, options)
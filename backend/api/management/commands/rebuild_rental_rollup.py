@@ -0,0 +1,28 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the RentalDailyRollup table from RentalLog in bulk. "
+        "Use --since to only recompute days from that date on."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", help="First day to rebuild (YYYY-MM-DD). Default: everything.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        since = None
+        if options["since"]:
+            try:
+                since = date.fromisoformat(options["since"])
+            except ValueError:
+                raise CommandError("--since must be a date in YYYY-MM-DD format.")
+
+        written = rebuild_rollups(since=since, batch_size=options["batch_size"])
+        scope = f"from {since}" if since else "from scratch"
+        self.stdout.write(self.style.SUCCESS(f"✅ Rebuilt rental rollup {scope}: {written} rows."))
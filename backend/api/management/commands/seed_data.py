@@ -2,6 +2,7 @@ from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
 from django.utils import timezone
 from datetime import timedelta
+from django.db.models import Q
 from api.models import Bicycle, UserProfile, RentalLog  # ✅ changed from 'core' to 'api'
 
 class Command(BaseCommand):
@@ -84,6 +85,12 @@ class Command(BaseCommand):
         ]
 
         for data in sample_rentals:
+            # Only one ongoing rental per user / bike is allowed
+            if data["status"] == "ongoing" and RentalLog.objects.filter(
+                Q(user=data["user"]) | Q(bicycle=data["bicycle"]), status="ongoing"
+            ).exists():
+                continue
+
             rental, created = RentalLog.objects.get_or_create(
                 user=data["user"],
                 bicycle=data["bicycle"],
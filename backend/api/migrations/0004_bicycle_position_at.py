@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 23:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bicycle',
+            name='position_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-17 23:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_bicycle_position_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BicycleTelemetry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recorded_at', models.DateTimeField()),
+                ('lat_e7', models.IntegerField()),
+                ('lon_e7', models.IntegerField()),
+                ('bicycle', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='telemetry', to='api.bicycle')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['bicycle', 'recorded_at'], name='telemetry_bike_time_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-17 23:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_bicycletelemetry'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bicycle',
+            index=models.Index(fields=['latitude', 'longitude'], name='bicycle_lat_lon_idx'),
+        ),
+    ]
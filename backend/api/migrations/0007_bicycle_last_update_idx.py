@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-17 23:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_bicycle_lat_lon_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bicycle',
+            index=models.Index(fields=['last_update'], name='bicycle_last_update_idx'),
+        ),
+    ]
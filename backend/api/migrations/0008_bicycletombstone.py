@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-17 23:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_bicycle_last_update_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BicycleTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bicycle_id', models.BigIntegerField()),
+                ('device_id', models.CharField(max_length=100)),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+    ]
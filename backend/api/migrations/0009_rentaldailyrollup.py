@@ -0,0 +1,65 @@
+# Generated by Django 5.2.7 on 2026-10-17 23:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+
+
+def backfill_rollups(apps, schema_editor):
+    """
+    The dashboard's weekly chart reads only from the rollup: fill it from the
+    existing rental log (same GROUP BY as api.rollups.rebuild_rollups).
+    """
+    RentalLog = apps.get_model('api', 'RentalLog')
+    RentalDailyRollup = apps.get_model('api', 'RentalDailyRollup')
+
+    completed = Q(status='completed')
+    grouped = (
+        RentalLog.objects
+        .annotate(day=TruncDate('start_time'))
+        .values('day', 'bicycle_id')
+        .annotate(
+            n=Count('id'),
+            n_completed=Count('id', filter=completed),
+            duration=Coalesce(Sum('duration_minutes', filter=completed), 0.0),
+            distance=Coalesce(Sum('distance_km', filter=completed), 0.0),
+        )
+        .order_by()
+    )
+    batch = []
+    for row in grouped.iterator(chunk_size=1000):
+        batch.append(RentalDailyRollup(
+            date=row['day'], bicycle_id=row['bicycle_id'], rentals=row['n'],
+            completed=row['n_completed'], duration_minutes=row['duration'], distance_km=row['distance'],
+        ))
+        if len(batch) >= 1000:
+            RentalDailyRollup.objects.bulk_create(batch)
+            batch = []
+    RentalDailyRollup.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_bicycletombstone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RentalDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('rentals', models.IntegerField(default=0)),
+                ('completed', models.IntegerField(default=0)),
+                ('duration_minutes', models.FloatField(default=0)),
+                ('distance_km', models.FloatField(default=0)),
+                ('bicycle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='api.bicycle')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('date', 'bicycle'), name='rollup_date_bicycle_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.7 on 2026-10-17 23:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def close_duplicate_ongoing_rentals(apps, schema_editor):
+    """
+    The one-ongoing-rental constraints cannot be added while duplicates exist:
+    keep the newest ongoing rental per user and per bike and complete the
+    older ones at the moment the newer one started.
+    """
+    RentalLog = apps.get_model('api', 'RentalLog')
+    for key in ('user_id', 'bicycle_id'):
+        newest = {}
+        ongoing = RentalLog.objects.filter(status='ongoing').order_by(key, '-start_time', '-id')
+        for rental in ongoing:
+            owner = getattr(rental, key)
+            if owner not in newest:
+                newest[owner] = rental
+                continue
+            rental.status = 'completed'
+            rental.end_time = max(newest[owner].start_time, rental.start_time)
+            rental.duration_minutes = (rental.end_time - rental.start_time).total_seconds() / 60.0
+            rental.save(update_fields=['status', 'end_time', 'duration_minutes'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_rentaldailyrollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='rentallog',
+            index=models.Index(fields=['start_time', 'id'], name='rental_start_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rentallog',
+            index=models.Index(fields=['user', 'start_time', 'id'], name='rental_user_start_idx'),
+        ),
+        migrations.RunPython(close_duplicate_ongoing_rentals, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='rentallog',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'ongoing')), fields=('user',), name='rental_one_ongoing_per_user'),
+        ),
+        migrations.AddConstraint(
+            model_name='rentallog',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'ongoing')), fields=('bicycle',), name='rental_one_ongoing_per_bicycle'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.7 on 2026-10-17 23:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def normalize_rfid_tags(apps, schema_editor):
+    """
+    Blank tags become NULL and each tag keeps only its earliest-registered
+    profile; the later duplicates lose the tag and are listed so an admin can
+    re-assign them.
+    """
+    UserProfile = apps.get_model('api', 'UserProfile')
+    UserProfile.objects.filter(rfid_tag='').update(rfid_tag=None)
+
+    seen = set()
+    tagged = UserProfile.objects.filter(rfid_tag__isnull=False).order_by('registered_date', 'id')
+    for profile in tagged.iterator():
+        tag = profile.rfid_tag.strip()
+        if tag in seen:
+            print(f"  RFID tag {tag!r} removed from duplicate profile {profile.id} (user {profile.user_id})")
+            profile.rfid_tag = None
+        else:
+            seen.add(tag)
+            profile.rfid_tag = tag or None
+        profile.save(update_fields=['rfid_tag'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_rental_fleet_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_rfid_tags, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='userprofile',
+            constraint=models.UniqueConstraint(condition=models.Q(('rfid_tag__isnull', False)), fields=('rfid_tag',), name='profile_rfid_tag_uniq'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.7 on 2026-10-17 23:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def expire_duplicate_pending_reservations(apps, schema_editor):
+    """
+    The one-pending-reservation constraints cannot be added while duplicates
+    exist: keep the newest pending reservation per user and per bike and mark
+    the older ones expired.
+    """
+    Reservation = apps.get_model('api', 'Reservation')
+    for key in ('user_id', 'bicycle_id'):
+        seen = set()
+        stale = []
+        pending = Reservation.objects.filter(status='pending').order_by(key, '-reserved_at', '-id')
+        for reservation_id, owner in pending.values_list('id', key):
+            if owner in seen:
+                stale.append(reservation_id)
+            seen.add(owner)
+        Reservation.objects.filter(id__in=stale).update(status='expired')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_profile_rfid_tag_unique'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['status', 'expiry_at'], name='reservation_status_expiry_idx'),
+        ),
+        migrations.RunPython(expire_duplicate_pending_reservations, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='reservation',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'pending')), fields=('user',), name='reservation_one_pending_per_user'),
+        ),
+        migrations.AddConstraint(
+            model_name='reservation',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'pending')), fields=('bicycle',), name='reservation_one_pending_per_bicycle'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 00:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_reservation_expiry'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bicycle',
+            index=models.Index(fields=['status', 'last_update'], name='bicycle_status_seen_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:20
+
+from django.db import migrations, models
+
+
+def backfill_offline_since(apps, schema_editor):
+    # Best available estimate for bikes already offline: when they were last heard from
+    Bicycle = apps.get_model('api', 'Bicycle')
+    Bicycle.objects.filter(status='offline').update(offline_since=models.F('last_update'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_bicycle_status_seen_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bicycle',
+            name='offline_since',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='bicycle',
+            index=models.Index(fields=['offline_since'], name='bicycle_offline_since_idx'),
+        ),
+        migrations.RunPython(backfill_offline_since, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,15 @@
+import numpy as np
+from django.conf import settings
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth.models import User
 from django.utils import timezone
 from datetime import timedelta
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
+from .geo import track_distance_km
+
 # 1️⃣ Bicycle model
 class Bicycle(models.Model):
     STATUS_CHOICES = [
@@ -18,7 +23,29 @@ class Bicycle(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='available')
     latitude = models.FloatField(null=True, blank=True)
     longitude = models.FloatField(null=True, blank=True)
+    position_at = models.DateTimeField(null=True, blank=True)  # device time of the stored position
     last_update = models.DateTimeField(auto_now=True)
+    offline_since = models.DateTimeField(null=True, blank=True)  # when status last became offline
+
+    class Meta:
+        indexes = [
+            # Viewport (bbox) queries from the tracking map
+            models.Index(fields=['latitude', 'longitude'], name='bicycle_lat_lon_idx'),
+            # Change feed (SSE stream): bikes whose last_update moved
+            models.Index(fields=['last_update'], name='bicycle_last_update_idx'),
+            # Available list, dashboard counts (leading column), and the offline
+            # sweeper: available bikes not heard from since a cutoff
+            models.Index(fields=['status', 'last_update'], name='bicycle_status_seen_idx'),
+            # Delta sync / change feed: bikes marked offline since a cursor
+            models.Index(fields=['offline_since'], name='bicycle_offline_since_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.status == 'offline':
+            self.offline_since = self.offline_since or timezone.now()
+        else:
+            self.offline_since = None
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Bike {self.device_id} ({self.status})"
@@ -30,6 +57,17 @@ class UserProfile(models.Model):
     rfid_tag = models.CharField(max_length=100, blank=True, null=True)
     registered_date = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            # One user per tag; also the index behind RFID tap lookups (untagged rows are not indexed)
+            models.UniqueConstraint(fields=['rfid_tag'], condition=Q(rfid_tag__isnull=False), name='profile_rfid_tag_uniq'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # "No tag" is always NULL, so blank tags never collide in the unique constraint
+        self.rfid_tag = (self.rfid_tag or '').strip() or None
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.user.username
 
@@ -69,6 +107,20 @@ class Reservation(models.Model):
             self.expiry_at = timezone.now() + timedelta(minutes=10)
         super().save(*args, **kwargs)
     
+    class Meta:
+        indexes = [
+            # Expiry sweeper: pending reservations due before a cutoff, oldest first
+            models.Index(fields=['status', 'expiry_at'], name='reservation_status_expiry_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user'], condition=Q(status='pending'), name='reservation_one_pending_per_user'
+            ),
+            models.UniqueConstraint(
+                fields=['bicycle'], condition=Q(status='pending'), name='reservation_one_pending_per_bicycle'
+            ),
+        ]
+
     def is_active(self):
         return self.status == 'pending' and timezone.now() <= self.expiry_at
 
@@ -91,16 +143,152 @@ class RentalLog(models.Model):
     distance_km = models.FloatField(null=True, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='ongoing')
 
+    class Meta:
+        indexes = [
+            # Dashboard, exports and the admin log (cursor pagination on start_time, id)
+            models.Index(fields=['start_time', 'id'], name='rental_start_time_idx'),
+            # A user's ride history, newest first (scanned backwards)
+            models.Index(fields=['user', 'start_time', 'id'], name='rental_user_start_idx'),
+        ]
+        constraints = [
+            # At most one ongoing rental per user and per bike. Also the index behind
+            # the "does this user/bike have an ongoing ride" lookups.
+            models.UniqueConstraint(fields=['user'], condition=Q(status='ongoing'), name='rental_one_ongoing_per_user'),
+            models.UniqueConstraint(fields=['bicycle'], condition=Q(status='ongoing'), name='rental_one_ongoing_per_bicycle'),
+        ]
+
     def complete(self, end_time=None, distance_km=None):
         if not end_time:
             end_time = timezone.now()
         self.end_time = end_time
         delta = end_time - self.start_time
         self.duration_minutes = delta.total_seconds() / 60.0
+        if distance_km is None:
+            distance_km = self.trace_distance_km(end_time)
         if distance_km is not None:
             self.distance_km = distance_km
         self.status = 'completed'
         self.save()
 
+    def trace_distance_km(self, end_time=None):
+        """
+        Distance ridden according to the bike's telemetry between start_time and
+        end_time, with GPS spikes and teleports filtered out. None if the bike
+        reported fewer than two positions during the ride.
+        """
+        points = BicycleTelemetry.objects.filter(
+            bicycle_id=self.bicycle_id,
+            recorded_at__gte=self.start_time,
+            recorded_at__lte=end_time or timezone.now(),
+        ).order_by('recorded_at').values_list('lat_e7', 'lon_e7', 'recorded_at')
+
+        lat_e7, lon_e7, seconds = [], [], []
+        for lat, lon, recorded_at in points:
+            lat_e7.append(lat)
+            lon_e7.append(lon)
+            seconds.append(recorded_at.timestamp())
+
+        if len(seconds) < 2:
+            return None
+
+        scale = BicycleTelemetry.COORD_SCALE
+        distance = track_distance_km(
+            np.asarray(lat_e7, dtype=float) / scale,
+            np.asarray(lon_e7, dtype=float) / scale,
+            seconds,
+            max_speed_kmh=settings.RIDE_MAX_SPEED_KMH,
+        )
+        return round(distance, 3)
+
     def __str__(self):
         return f"{self.user.username} - {self.bicycle.device_id} ({self.status})"
+
+
+# 5️⃣ Bicycle Telemetry (position history, one row per accepted uplink)
+class BicycleTelemetry(models.Model):
+    # Coordinates are stored as fixed-point integers (degrees * 1e7, ~1 cm resolution)
+    COORD_SCALE = 10_000_000
+
+    # No separate FK index: the (bicycle, recorded_at) index below covers bicycle lookups
+    bicycle = models.ForeignKey(Bicycle, on_delete=models.CASCADE, related_name='telemetry', db_index=False)
+    recorded_at = models.DateTimeField()
+    lat_e7 = models.IntegerField()
+    lon_e7 = models.IntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['bicycle', 'recorded_at'], name='telemetry_bike_time_idx'),
+        ]
+
+    @classmethod
+    def to_fixed(cls, degrees):
+        return int(round(degrees * cls.COORD_SCALE))
+
+    @property
+    def latitude(self):
+        return self.lat_e7 / self.COORD_SCALE
+
+    @property
+    def longitude(self):
+        return self.lon_e7 / self.COORD_SCALE
+
+    def __str__(self):
+        return f"Bike {self.bicycle_id} @ {self.recorded_at:%Y-%m-%d %H:%M:%S} ({self.latitude}, {self.longitude})"
+
+
+# 6️⃣ Bicycle Tombstone (deleted bikes, reported by delta sync)
+class BicycleTombstone(models.Model):
+    bicycle_id = models.BigIntegerField()
+    device_id = models.CharField(max_length=100)
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"Deleted bike {self.device_id} ({self.deleted_at:%Y-%m-%d %H:%M})"
+
+
+# 7️⃣ Rental Daily Rollup (per day and bike, maintained incrementally by api/rollups.py)
+class RentalDailyRollup(models.Model):
+    date = models.DateField()  # day the rentals started
+    bicycle = models.ForeignKey(Bicycle, on_delete=models.CASCADE, related_name='daily_rollups')
+    rentals = models.IntegerField(default=0)
+    completed = models.IntegerField(default=0)
+    duration_minutes = models.FloatField(default=0)
+    distance_km = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            # Also serves as the (date, ...) index for date-range reports
+            models.UniqueConstraint(fields=['date', 'bicycle'], name='rollup_date_bicycle_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} - bike {self.bicycle_id}: {self.rentals} rentals"
+
+
+# 8️⃣ User Import Job (POST /api/users/import/, run by `manage.py import_users --queued`)
+class UserImportJob(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    created_by = models.ForeignKey(User, null=True, on_delete=models.SET_NULL, related_name='+')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    # The uploaded rows, plaintext passwords included: emptied as soon as the job has run
+    rows = models.JSONField(default=list)
+    total = models.IntegerField(default=0)
+    created = models.IntegerField(default=0)
+    errors = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Import worker: oldest pending job first
+            models.Index(fields=['status', 'created_at'], name='import_job_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Import {self.id}: {self.created}/{self.total} ({self.status})"
@@ -0,0 +1,16 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class RentalCursorPagination(CursorPagination):
+    """
+    Keyset pagination for rental logs, newest first.
+
+    The cursor encodes the last start_time seen (plus an offset only for rows
+    sharing that exact timestamp), so every page is an index range scan
+    starting at the cursor instead of an OFFSET over all earlier rows.
+    """
+    ordering = ("-start_time", "-id")
+    page_size = settings.RENTAL_PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = settings.RENTAL_MAX_PAGE_SIZE
@@ -0,0 +1,37 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.contrib.auth.hashers import make_password
+
+
+# -------------------------------
+# Password hashing in a process pool (bulk user import)
+# -------------------------------
+# Kept free of model imports: spawned workers import this module before
+# django.setup() has run in them.
+
+# Below this many passwords a process pool costs more than it saves
+_POOL_MIN_PASSWORDS = 8
+
+
+def _init_worker():
+    # DJANGO_SETTINGS_MODULE is inherited from the parent process
+    django.setup()
+
+
+def hash_passwords(passwords, workers):
+    """
+    make_password() for every password (None gets an unusable password), in
+    a pool of `workers` processes: hashing is CPU-bound and dominates the
+    import, and threads would be serialized by the GIL.
+    """
+    todo = [p for p in passwords if p is not None]
+    if workers <= 1 or len(todo) < _POOL_MIN_PASSWORDS:
+        return [make_password(p) for p in passwords]
+
+    # spawn, not fork: the server process may be running ingest threads
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker) as pool:
+        hashed = iter(pool.map(make_password, todo, chunksize=max(1, len(todo) // (workers * 4))))
+    return [next(hashed) if p is not None else make_password(None) for p in passwords]
@@ -0,0 +1,178 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+
+from .models import Bicycle
+
+
+# -------------------------------
+# In-process device registry (device_id -> pk, status, last position)
+# -------------------------------
+DeviceEntry = namedtuple(
+    "DeviceEntry", ["pk", "status", "latitude", "longitude", "position_at", "last_update"]
+)
+
+_FIELDS = ("device_id", "id", "status", "latitude", "longitude", "position_at", "last_update")
+
+# Placeholder for a device that is known to exist but whose entry must be re-read
+_STALE = object()
+
+
+def _entry(row):
+    device_id, *fields = row
+    return device_id, DeviceEntry(*fields)
+
+
+class DeviceRegistry:
+    """
+    Bounded LRU map of device_id -> DeviceEntry used by the webhook to skip
+    the per-uplink Bicycle lookup.
+
+    The whole fleet (up to `max_size` bikes) is loaded with one query on first
+    use and reloaded every `ttl` seconds, which bounds how stale entries can get
+    when another process changes a bike. A device_id the registry does not
+    know is rejected without touching the database for `negative_ttl` seconds,
+    so a bike created in another process is picked up quickly. Bicycle
+    post_save / post_delete signals keep it current within this process
+    (see api/signals.py).
+    """
+
+    def __init__(self, max_size, ttl, negative_ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+
+        self._entries = OrderedDict()
+        self._device_by_pk = {}
+        self._unknown = {}  # device_id -> monotonic time until which it is known not to exist
+        self._lock = threading.Lock()
+        self._loaded_at = None
+        self._complete = False
+        self._counters = {"hits": 0, "misses": 0, "unknown": 0, "loads": 0}
+
+    # -- internal helpers (caller holds the lock) --
+    def _store(self, device_id, entry):
+        self._entries[device_id] = entry
+        self._entries.move_to_end(device_id)
+        if entry is not _STALE:
+            self._device_by_pk[entry.pk] = device_id
+        while len(self._entries) > self.max_size:
+            evicted_id, evicted = self._entries.popitem(last=False)
+            if evicted is not _STALE:
+                self._device_by_pk.pop(evicted.pk, None)
+            self._complete = False
+
+    def _forget_pk(self, pk):
+        device_id = self._device_by_pk.pop(pk, None)
+        if device_id is not None:
+            self._entries.pop(device_id, None)
+
+    def _load(self):
+        rows = list(Bicycle.objects.order_by("-last_update").values_list(*_FIELDS)[:self.max_size + 1])
+        self._entries.clear()
+        self._device_by_pk.clear()
+        self._unknown.clear()
+        for row in rows[:self.max_size]:
+            self._store(*_entry(row))
+        self._complete = len(rows) <= self.max_size
+        self._loaded_at = time.monotonic()
+        self._counters["loads"] += 1
+
+    def _expired(self):
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl
+
+    def _known_unknown(self, device_id, now):
+        if self._complete and now - self._loaded_at < self.negative_ttl:
+            return True
+        expires = self._unknown.get(device_id)
+        return expires is not None and expires > now
+
+    # -- public API --
+    def get_many(self, device_ids):
+        """
+        Return {device_id: DeviceEntry} for the given IDs that exist. Unknown
+        IDs are simply absent. Costs at most one query for entries not cached.
+        """
+        found, missing = {}, []
+        with self._lock:
+            if self._expired():
+                self._load()
+
+            now = time.monotonic()
+            for device_id in device_ids:
+                entry = self._entries.get(device_id)
+                if entry is None and self._known_unknown(device_id, now):
+                    self._counters["unknown"] += 1
+                elif entry is None or entry is _STALE:
+                    missing.append(device_id)
+                else:
+                    self._entries.move_to_end(device_id)
+                    found[device_id] = entry
+                    self._counters["hits"] += 1
+
+        if missing:
+            rows = Bicycle.objects.filter(device_id__in=missing).values_list(*_FIELDS)
+            with self._lock:
+                self._counters["misses"] += len(missing)
+                for row in rows:
+                    device_id, entry = _entry(row)
+                    self._store(device_id, entry)
+                    found[device_id] = entry
+                if len(self._unknown) > self.max_size:
+                    self._unknown.clear()
+                expires = time.monotonic() + self.negative_ttl
+                for device_id in missing:
+                    if device_id in found:
+                        continue
+                    self._unknown[device_id] = expires
+                    # Still in _entries as _STALE means the device was deleted meanwhile
+                    if self._entries.get(device_id) is _STALE:
+                        del self._entries[device_id]
+
+        return found
+
+    def update(self, device_id, **fields):
+        """Apply fields written by the caller to a cached entry (no-op if absent)."""
+        with self._lock:
+            entry = self._entries.get(device_id)
+            if entry is not None and entry is not _STALE:
+                self._entries[device_id] = entry._replace(**fields)
+
+    def saved(self, pk, device_id):
+        """A bike row was created or changed outside the registry: re-read it on next use."""
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            self._forget_pk(pk)
+            self._unknown.pop(device_id, None)
+            self._store(device_id, _STALE)
+
+    def deleted(self, pk):
+        with self._lock:
+            self._forget_pk(pk)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._device_by_pk.clear()
+            self._unknown.clear()
+            self._loaded_at = None
+            self._complete = False
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "complete": self._complete,
+                **self._counters,
+            }
+
+
+device_registry = DeviceRegistry(
+    max_size=settings.DEVICE_REGISTRY_MAX_SIZE,
+    ttl=settings.DEVICE_REGISTRY_TTL,
+    negative_ttl=settings.DEVICE_REGISTRY_NEGATIVE_TTL,
+)
@@ -0,0 +1,120 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Bicycle, Reservation
+from .rides import RideError, _bike_status_changed, _bikes_status_changed, _find_bike, _release_expired_holds
+
+
+# -------------------------------
+# Reservations (hold a bike for RESERVATION_HOLD_MINUTES before unlocking it)
+# -------------------------------
+def reserve_bike(user, device_id):
+    """
+    Hold bike `device_id` for `user` until its expiry_at.
+
+    Like start_ride, the bike is claimed with UPDATE ... WHERE status='available'
+    and the reservation insert is guarded by the one-pending-reservation
+    constraints; a failed insert rolls the claim back. Expired holds on the
+    bike or by the user are released first, in the same transaction, so
+    correctness does not depend on the expire_reservations sweeper.
+    """
+    bike = _find_bike(device_id)
+    if bike is None:
+        raise RideError(f"Bicycle '{device_id}' not available or not found.", 404)
+    pk, latitude, longitude = bike
+
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            released = _release_expired_holds(now, user_id=user.id)
+            claim = Bicycle.objects.filter(pk=pk, status="available")
+            claimed = (
+                claim.update(status="reserved", last_update=now)
+                or (_release_expired_holds(now, bicycle_id=pk) and claim.update(status="reserved", last_update=now))
+            )
+            if not claimed:
+                raise RideError(f"Bicycle '{device_id}' not available or not found.", 404)
+            reservation = Reservation.objects.create(
+                user_id=user.id, bicycle_id=pk, status="pending",
+                expiry_at=now + timedelta(minutes=settings.RESERVATION_HOLD_MINUTES),
+            )
+    except IntegrityError:
+        if Reservation.objects.filter(user_id=user.id, status="pending").exists():
+            raise RideError("You already have an active reservation.", 400)
+        raise RideError(f"Bicycle '{device_id}' is already reserved.", 409)
+
+    other_bikes = [bike for bike in released if bike[0] != pk]
+    if other_bikes:
+        _bikes_status_changed(other_bikes, "available", now)
+    _bike_status_changed(pk, device_id, "reserved", latitude, longitude, now)
+    return reservation
+
+
+def cancel_reservation(user, reservation_id):
+    """Cancel `user`'s pending reservation and make its bike available again."""
+    row = (
+        Reservation.objects
+        .filter(id=reservation_id, user_id=user.id, status="pending")
+        .values_list("bicycle_id", "bicycle__device_id", "bicycle__latitude", "bicycle__longitude")
+        .first()
+    )
+    if row is None:
+        raise RideError("No pending reservation found with this id.", 404)
+
+    now = timezone.now()
+    with transaction.atomic():
+        cancelled = Reservation.objects.filter(id=reservation_id, status="pending").update(status="cancelled")
+        if not cancelled:
+            raise RideError("No pending reservation found with this id.", 404)
+        Bicycle.objects.filter(pk=row[0], status="reserved").update(status="available", last_update=now)
+
+    _bikes_status_changed([row], "available", now)
+
+
+def expire_due_reservations(now=None, batch_size=1000):
+    """
+    Expire every pending reservation whose expiry_at has passed and release
+    its bike. Returns the number of reservations expired.
+
+    Each batch is one range scan on (status, expiry_at), oldest first, and two
+    UPDATEs in one transaction. Rows are locked with SKIP LOCKED so a batch
+    never waits for (or overrides) a reservation that is being confirmed or
+    cancelled at the same moment; the UPDATE re-checks status='pending'.
+    """
+    now = now or timezone.now()
+    expired = 0
+    while True:
+        with transaction.atomic():
+            due = list(
+                Reservation.objects
+                .select_for_update(skip_locked=True, of=("self",))
+                .filter(status="pending", expiry_at__lte=now)
+                .order_by("expiry_at")
+                .values_list("id", "bicycle_id", "bicycle__device_id", "bicycle__latitude", "bicycle__longitude")
+                [:batch_size]
+            )
+            if not due:
+                return expired
+            Reservation.objects.filter(id__in=[row[0] for row in due], status="pending").update(status="expired")
+            Bicycle.objects.filter(pk__in=[row[1] for row in due], status="reserved").update(
+                status="available", last_update=now
+            )
+
+        _bikes_status_changed([row[1:] for row in due], "available", now)
+        expired += len(due)
+        if len(due) < batch_size:
+            return expired
+
+
+def next_expiry():
+    """expiry_at of the earliest pending reservation (one index lookup), or None."""
+    return (
+        Reservation.objects
+        .filter(status="pending")
+        .order_by("expiry_at")
+        .values_list("expiry_at", flat=True)
+        .first()
+    )
@@ -0,0 +1,95 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+
+from .models import UserProfile
+
+
+# -------------------------------
+# In-process RFID tag cache (rfid_tag -> user)
+# -------------------------------
+TagOwner = namedtuple("TagOwner", ["user_id", "username", "is_active"])
+
+
+class RfidTagCache:
+    """
+    Bounded LRU map of rfid_tag -> TagOwner for the tap endpoint.
+
+    A miss costs one lookup on the unique rfid_tag index. Known tags are kept
+    for `ttl` seconds, unknown ones for `negative_ttl` seconds (so a tag just
+    assigned in another process is picked up quickly). UserProfile / User
+    saves and deletes drop affected entries in this process (api/signals.py).
+    """
+
+    def __init__(self, max_size, ttl, negative_ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+
+        self._entries = OrderedDict()  # tag -> (TagOwner or None, expires)
+        self._tag_by_user = {}
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0}
+
+    def lookup(self, tag):
+        """Return the TagOwner of `tag`, or None if no profile has it."""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._entries.get(tag)
+            if cached is not None and cached[1] > now:
+                self._entries.move_to_end(tag)
+                self._counters["hits"] += 1
+                return cached[0]
+
+        row = (
+            UserProfile.objects
+            .filter(rfid_tag=tag)
+            .values_list("user_id", "user__username", "user__is_active")
+            .first()
+        )
+        owner = TagOwner(*row) if row else None
+
+        with self._lock:
+            self._counters["misses"] += 1
+            self._forget_tag(tag)
+            ttl = self.ttl if owner else self.negative_ttl
+            self._entries[tag] = (owner, time.monotonic() + ttl)
+            if owner:
+                self._tag_by_user[owner.user_id] = tag
+            while len(self._entries) > self.max_size:
+                evicted_tag, (evicted, _) = self._entries.popitem(last=False)
+                if evicted:
+                    self._tag_by_user.pop(evicted.user_id, None)
+        return owner
+
+    def _forget_tag(self, tag):
+        cached = self._entries.pop(tag, None)
+        if cached is not None and cached[0] is not None:
+            self._tag_by_user.pop(cached[0].user_id, None)
+
+    def forget(self, user_id, tag=None):
+        """Drop the entry of `user_id` (their old tag) and of `tag` (e.g. their new one)."""
+        with self._lock:
+            old_tag = self._tag_by_user.get(user_id)
+            if old_tag is not None:
+                self._forget_tag(old_tag)
+            if tag:
+                self._forget_tag(tag)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tag_by_user.clear()
+
+    def metrics(self):
+        with self._lock:
+            return {"size": len(self._entries), "max_size": self.max_size, **self._counters}
+
+
+rfid_tags = RfidTagCache(
+    max_size=settings.RFID_TAG_CACHE_SIZE,
+    ttl=settings.RFID_TAG_CACHE_TTL,
+    negative_ttl=settings.RFID_TAG_NEGATIVE_TTL,
+)
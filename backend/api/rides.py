@@ -0,0 +1,176 @@
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .dashboard import invalidate_dashboard
+from .models import Bicycle, RentalLog, Reservation
+from .registry import device_registry
+from .rollups import contribution, record_rental_change
+from .spatial import available_bikes
+
+
+# -------------------------------
+# Ride start / completion (optimistic, conditional UPDATEs)
+# -------------------------------
+class RideError(Exception):
+    """A ride request that cannot be honoured; carries the HTTP status to answer with."""
+
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def _bikes_status_changed(bikes, status, now=None):
+    # Bulk .update() sends no post_save, so do what api/signals.py would have done
+    # (once per batch); `bikes` are (pk, device_id, latitude, longitude) rows.
+    # `now` is the last_update written, if the UPDATE set one.
+    invalidate_dashboard("stats")
+    fields = {"status": status} if now is None else {"status": status, "last_update": now}
+    for pk, device_id, latitude, longitude in bikes:
+        device_registry.update(device_id, **fields)
+        available_bikes.bicycle_saved(pk, device_id, status, latitude, longitude)
+
+
+def _bike_status_changed(pk, device_id, status, latitude, longitude, now):
+    _bikes_status_changed([(pk, device_id, latitude, longitude)], status, now)
+
+
+def _find_bike(device_id):
+    entry = device_registry.get_many([device_id]).get(device_id)
+    if entry is not None:
+        return entry.pk, entry.latitude, entry.longitude
+    # Not known to this process yet (e.g. just created elsewhere)
+    return Bicycle.objects.filter(device_id=device_id).values_list("id", "latitude", "longitude").first()
+
+
+def start_ride(user, device_id):
+    """
+    Claim bike `device_id` for `user` and open a rental.
+
+    The bike is claimed with UPDATE ... WHERE status='available' (no SELECT FOR
+    UPDATE): of two concurrent requests for the same bike exactly one updates a
+    row. A bike the user holds a live reservation on is claimed the same way,
+    by confirming the reservation first (UPDATE ... WHERE status='pending' AND
+    expiry_at > now, which loses to a concurrent expiry). A bike held by an
+    expired reservation is released on the spot, so rides never depend on the
+    expire_reservations sweeper having run. The rental insert is guarded by
+    the one-ongoing-rental constraints; if it fails, the whole transaction
+    (including the claim) rolls back.
+    """
+    bike = _find_bike(device_id)
+    if bike is None:
+        raise RideError(f"Bicycle '{device_id}' not available or not found.", 404)
+    pk, latitude, longitude = bike
+
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            claim = Bicycle.objects.filter(pk=pk, status="available")
+            claimed = (
+                claim.update(status="in_use", last_update=now)
+                or _claim_reserved(user, pk, now)
+                or (_release_expired_holds(now, bicycle_id=pk) and claim.update(status="in_use", last_update=now))
+            )
+            if not claimed:
+                raise RideError(f"Bicycle '{device_id}' not available or not found.", 404)
+            rental = RentalLog.objects.create(user_id=user.id, bicycle_id=pk, start_time=now, status="ongoing")
+            record_rental_change(None, contribution(rental))
+    except IntegrityError:
+        if RentalLog.objects.filter(user_id=user.id, status="ongoing").exists():
+            raise RideError("You already have an ongoing ride.", 400)
+        raise RideError(f"Bicycle '{device_id}' already has an ongoing rental.", 409)
+
+    _bike_status_changed(pk, device_id, "in_use", latitude, longitude, now)
+
+    return {
+        "message": f"Ride started successfully for bike {device_id}.",
+        "rental_id": rental.id,
+        "bike_id": device_id,
+        "user": user.username,
+        "status": rental.status,
+        "start_time": rental.start_time,
+    }
+
+
+def _claim_reserved(user, pk, now):
+    confirmed = Reservation.objects.filter(
+        user_id=user.id, bicycle_id=pk, status="pending", expiry_at__gt=now
+    ).update(status="confirmed")
+    if not confirmed:
+        return 0
+    return Bicycle.objects.filter(pk=pk, status="reserved").update(status="in_use", last_update=now)
+
+
+def _release_expired_holds(now, **match):
+    """
+    Expire the due pending reservations matching `match` (bicycle_id= or
+    user_id=) and make their bikes available; returns the released bikes as
+    (pk, device_id, latitude, longitude). Runs in the caller's transaction.
+    """
+    due = list(
+        Reservation.objects
+        .filter(status="pending", expiry_at__lte=now, **match)
+        .values_list("id", "bicycle_id", "bicycle__device_id", "bicycle__latitude", "bicycle__longitude")
+    )
+    if not due:
+        return []
+    Reservation.objects.filter(id__in=[row[0] for row in due], status="pending").update(status="expired")
+    Bicycle.objects.filter(pk__in=[row[1] for row in due], status="reserved").update(
+        status="available", last_update=now
+    )
+    return [row[1:] for row in due]
+
+
+def complete_ride(user, rental_id):
+    """
+    Close `user`'s ongoing rental `rental_id` and release its bike.
+
+    The rental is finished with a single conditional UPDATE (WHERE
+    status='ongoing'), so a retried or concurrent completion finds nothing to
+    update instead of completing twice. The distance comes from the bike's
+    telemetry trace during the ride.
+    """
+    row = (
+        RentalLog.objects
+        .filter(id=rental_id, user_id=user.id, status="ongoing")
+        .values("id", "bicycle_id", "start_time", "bicycle__device_id", "bicycle__latitude", "bicycle__longitude")
+        .first()
+    )
+    if row is None:
+        raise RideError("No ongoing ride found with this rental_id.", 404)
+
+    now = timezone.now()
+    rental = RentalLog(id=row["id"], user_id=user.id, bicycle_id=row["bicycle_id"],
+                       start_time=row["start_time"], status="ongoing")
+    before = contribution(rental)
+    rental.end_time = now
+    rental.duration_minutes = (now - rental.start_time).total_seconds() / 60.0
+    rental.distance_km = rental.trace_distance_km(now)
+    rental.status = "completed"
+
+    with transaction.atomic():
+        completed = RentalLog.objects.filter(id=rental.id, status="ongoing").update(
+            status="completed",
+            end_time=rental.end_time,
+            duration_minutes=rental.duration_minutes,
+            distance_km=rental.distance_km,
+        )
+        if not completed:
+            raise RideError("No ongoing ride found with this rental_id.", 404)
+        Bicycle.objects.filter(pk=rental.bicycle_id, status="in_use").update(status="available", last_update=now)
+        record_rental_change(before, contribution(rental))
+        invalidate_dashboard()
+
+    device_id = row["bicycle__device_id"]
+    _bike_status_changed(rental.bicycle_id, device_id, "available",
+                         row["bicycle__latitude"], row["bicycle__longitude"], now)
+
+    return {
+        "message": f"Ride completed successfully for bike {device_id}.",
+        "rental_id": rental.id,
+        "bike_id": device_id,
+        "duration_minutes": rental.duration_minutes,
+        "distance_km": rental.distance_km,
+        "end_time": rental.end_time,
+        "status": rental.status,
+    }
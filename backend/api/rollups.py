@@ -0,0 +1,116 @@
+from collections import namedtuple
+from datetime import datetime, time
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import RentalDailyRollup, RentalLog
+
+
+# -------------------------------
+# Daily rental rollup (incremental maintenance + bulk rebuild)
+# -------------------------------
+# What one rental contributes to its (date, bicycle) rollup row
+Contribution = namedtuple("Contribution", ["date", "bicycle_id", "rentals", "completed", "duration_minutes", "distance_km"])
+
+
+def contribution(rental):
+    """Snapshot of a rental's share of the rollup; take one before changing the rental."""
+    if rental is None:
+        return None
+    completed = rental.status == "completed"
+    return Contribution(
+        date=timezone.localdate(rental.start_time),
+        bicycle_id=rental.bicycle_id,
+        rentals=1,
+        completed=int(completed),
+        duration_minutes=(rental.duration_minutes or 0) if completed else 0,
+        distance_km=(rental.distance_km or 0) if completed else 0,
+    )
+
+
+def _apply(date, bicycle_id, rentals, completed, duration_minutes, distance_km):
+    if not (rentals or completed or duration_minutes or distance_km):
+        return
+
+    increments = {
+        "rentals": F("rentals") + rentals,
+        "completed": F("completed") + completed,
+        "duration_minutes": F("duration_minutes") + duration_minutes,
+        "distance_km": F("distance_km") + distance_km,
+    }
+    row = RentalDailyRollup.objects.filter(date=date, bicycle_id=bicycle_id)
+    if row.update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            RentalDailyRollup.objects.create(
+                date=date, bicycle_id=bicycle_id, rentals=rentals, completed=completed,
+                duration_minutes=duration_minutes, distance_km=distance_km,
+            )
+    except IntegrityError:
+        # Another request created the row first
+        row.update(**increments)
+
+
+def record_rental_change(before, after):
+    """
+    Move the rollup from `before` to `after` (Contributions from `contribution()`,
+    None for a rental that did not exist / no longer exists). Call inside the
+    transaction that writes the rental so both commit together.
+    """
+    if before is not None and after is not None and before[:2] == after[:2]:
+        _apply(before.date, before.bicycle_id,
+               *(new - old for new, old in zip(after[2:], before[2:])))
+        return
+    if before is not None:
+        _apply(before.date, before.bicycle_id, *(-value for value in before[2:]))
+    if after is not None:
+        _apply(*after)
+
+
+def rebuild_rollups(since=None, batch_size=1000):
+    """
+    Recompute the rollup from RentalLog with one GROUP BY, replacing every row
+    dated `since` or later (the whole table if `since` is None). Returns the
+    number of rollup rows written.
+    """
+    rentals = RentalLog.objects.all()
+    stale = RentalDailyRollup.objects.all()
+    if since is not None:
+        start = timezone.make_aware(datetime.combine(since, time.min))
+        rentals = rentals.filter(start_time__gte=start)
+        stale = stale.filter(date__gte=since)
+
+    completed = Q(status="completed")
+    grouped = (
+        rentals
+        .annotate(day=TruncDate("start_time"))
+        .values("day", "bicycle_id")
+        .annotate(
+            n=Count("id"),
+            n_completed=Count("id", filter=completed),
+            duration=Coalesce(Sum("duration_minutes", filter=completed), 0.0),
+            distance=Coalesce(Sum("distance_km", filter=completed), 0.0),
+        )
+        .order_by()
+    )
+
+    written = 0
+    with transaction.atomic():
+        stale.delete()
+        batch = []
+        for row in grouped.iterator(chunk_size=batch_size):
+            batch.append(RentalDailyRollup(
+                date=row["day"], bicycle_id=row["bicycle_id"], rentals=row["n"],
+                completed=row["n_completed"], duration_minutes=row["duration"], distance_km=row["distance"],
+            ))
+            if len(batch) >= batch_size:
+                RentalDailyRollup.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        RentalDailyRollup.objects.bulk_create(batch)
+        written += len(batch)
+    return written
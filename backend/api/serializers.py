@@ -1,7 +1,7 @@
 from django.contrib.auth.models import User
 from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from .models import Bicycle, UserProfile, Reservation, RentalLog
+from .models import Bicycle, UserProfile, Reservation, RentalLog, UserImportJob
 from datetime import timedelta
 from django.utils import timezone
 
@@ -69,6 +69,62 @@ class RentalLogSerializer(serializers.ModelSerializer):
         }
 
 
+# 5️⃣b Flat rental rows: same JSON as RentalLogSerializer, built straight from values()
+RENTAL_FLAT_FIELDS = (
+    'id', 'start_time', 'end_time', 'duration_minutes', 'distance_km', 'status',
+    'user_id', 'user__username', 'user__email',
+    'bicycle_id', 'bicycle__device_id', 'bicycle__status', 'bicycle__latitude',
+    'bicycle__longitude', 'bicycle__last_update',
+)
+
+
+def _iso(value, tz):
+    """DateTimeField representation as DRF renders it (UTC as 'Z')."""
+    if value is None:
+        return None
+    if timezone.is_aware(value):
+        value = value.astimezone(tz)
+    text = value.isoformat()
+    return text[:-6] + 'Z' if text.endswith('+00:00') else text
+
+
+def rental_rows(queryset):
+    """RentalLog queryset -> values() queryset with the columns flatten_rentals() needs."""
+    return queryset.values(*RENTAL_FLAT_FIELDS)
+
+
+def flatten_rentals(rows):
+    """
+    Build RentalLogSerializer-shaped dicts from rental_rows() rows, without
+    model instances or per-field serializer calls (admin log and history pages).
+    """
+    tz = timezone.get_current_timezone()
+    return [
+        {
+            'id': row['id'],
+            'user': {
+                'id': row['user_id'],
+                'username': row['user__username'],
+                'email': row['user__email'],
+            },
+            'bicycle': {
+                'id': row['bicycle_id'],
+                'device_id': row['bicycle__device_id'],
+                'status': row['bicycle__status'],
+                'latitude': row['bicycle__latitude'],
+                'longitude': row['bicycle__longitude'],
+                'last_update': _iso(row['bicycle__last_update'], tz),
+            },
+            'start_time': _iso(row['start_time'], tz),
+            'end_time': _iso(row['end_time'], tz),
+            'duration_minutes': row['duration_minutes'],
+            'distance_km': row['distance_km'],
+            'status': row['status'],
+        }
+        for row in rows
+    ]
+
+
 # 6️⃣ User Profile serializer
 class UserProfileSerializer(serializers.ModelSerializer):
     rfid_tag = serializers.CharField(required=False, allow_blank=True, allow_null=True)
@@ -78,6 +134,21 @@ class UserProfileSerializer(serializers.ModelSerializer):
         model = UserProfile
         fields = ['rfid_tag', 'registered_date']
 
+    def validate_rfid_tag(self, value):
+        value = (value or '').strip() or None
+        if value is None:
+            return None
+        taken = UserProfile.objects.filter(rfid_tag=value)
+        # Standalone the instance is the profile; nested in UserSerializer the parent holds the user
+        owner = getattr(self.parent, 'instance', None)
+        if isinstance(self.instance, UserProfile):
+            taken = taken.exclude(pk=self.instance.pk)
+        elif isinstance(owner, User):
+            taken = taken.exclude(user_id=owner.pk)
+        if taken.exists():
+            raise serializers.ValidationError("This RFID tag is already assigned to another user.")
+        return value
+
 
 
 # 7️⃣ User serializer (Admin CRUD)
@@ -143,3 +214,10 @@ class DashboardRecentRentalSerializer(serializers.Serializer):
         minutes = (seconds % 3600) // 60
         secs = seconds % 60
         return f"{hours:02d}:{minutes:02d}:{secs:02d}"
+
+
+# 9️⃣ User Import Job serializer (status of a queued bulk import; never the rows)
+class UserImportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UserImportJob
+        fields = ['id', 'status', 'total', 'created', 'errors', 'created_at', 'finished_at']
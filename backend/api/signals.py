@@ -0,0 +1,74 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import forget_user_state
+from .dashboard import invalidate_dashboard
+from .models import Bicycle, BicycleTombstone, RentalLog, UserProfile
+from .registry import device_registry
+from .rfid import rfid_tags
+from .spatial import available_bikes
+
+
+# -------------------------------
+# Bicycle change hooks
+# -------------------------------
+@receiver(post_save, sender=Bicycle)
+def bicycle_saved(sender, instance, **kwargs):
+    device_registry.saved(instance.pk, instance.device_id)
+    available_bikes.bicycle_saved(
+        instance.pk, instance.device_id, instance.status, instance.latitude, instance.longitude
+    )
+    # Position/heartbeat-only writes do not change any dashboard figure
+    if _touches(kwargs, "status"):
+        invalidate_dashboard("stats")
+
+
+@receiver(post_delete, sender=Bicycle)
+def bicycle_deleted(sender, instance, **kwargs):
+    device_registry.deleted(instance.pk)
+    available_bikes.deleted(instance.pk)
+    BicycleTombstone.objects.create(bicycle_id=instance.pk, device_id=instance.device_id)
+    invalidate_dashboard()
+
+
+# -------------------------------
+# Dashboard invalidation
+# -------------------------------
+def _touches(save_kwargs, *fields):
+    """True unless the save was restricted (update_fields) to fields other than `fields`."""
+    update_fields = save_kwargs.get("update_fields")
+    return save_kwargs.get("created") or update_fields is None or bool(set(fields) & set(update_fields))
+
+
+@receiver(post_save, sender=RentalLog)
+@receiver(post_delete, sender=RentalLog)
+def rental_changed(sender, instance, **kwargs):
+    invalidate_dashboard()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, **kwargs):
+    # Skips the last_login write done on every login
+    if _touches(kwargs, "is_active", "is_staff"):
+        invalidate_dashboard("stats")
+    if _touches(kwargs, "is_active", "username"):
+        rfid_tags.forget(instance.pk)
+    if _touches(kwargs, "username", "is_active", "is_staff", "is_superuser", "password"):
+        forget_user_state(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    invalidate_dashboard()
+    rfid_tags.forget(instance.pk)
+    forget_user_state(instance.pk)
+
+
+# -------------------------------
+# RFID tag cache invalidation
+# -------------------------------
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def profile_changed(sender, instance, **kwargs):
+    rfid_tags.forget(instance.user_id, instance.rfid_tag)
@@ -0,0 +1,86 @@
+import threading
+import time
+
+from django.conf import settings
+
+from .geo import GridIndex
+from .models import Bicycle
+
+
+# -------------------------------
+# In-process spatial index of available bikes
+# -------------------------------
+class AvailableBikeIndex:
+    """
+    GridIndex of the bikes that are currently available, for nearest-bike queries.
+
+    Loaded lazily with one query and rebuilt every `ttl` seconds (which bounds
+    drift from writes made by other processes). Between rebuilds it follows
+    webhook position updates (api/ingest.py) and Bicycle saves / deletes
+    (api/signals.py), so status transitions show up immediately.
+    """
+
+    def __init__(self, cell_deg, ttl):
+        self.ttl = ttl
+        self._grid = GridIndex(cell_deg)
+        self._lock = threading.Lock()
+        self._loaded_at = None
+
+    def _ensure_loaded(self):
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at <= self.ttl:
+            return
+        rows = Bicycle.objects.filter(
+            status="available", latitude__isnull=False, longitude__isnull=False
+        ).values_list("id", "device_id", "latitude", "longitude")
+        self._grid.clear()
+        for pk, device_id, latitude, longitude in rows:
+            self._grid.upsert(pk, latitude, longitude, device_id)
+        self._loaded_at = time.monotonic()
+
+    def nearest(self, latitude, longitude, k, radius_m):
+        with self._lock:
+            self._ensure_loaded()
+            matches = self._grid.nearest(latitude, longitude, k, radius_m)
+            points = [(pk, distance, self._grid.get(pk)) for pk, distance, _ in matches]
+
+        return [
+            {
+                "id": pk,
+                "device_id": device_id,
+                "latitude": bike_lat,
+                "longitude": bike_lon,
+                "distance_m": round(distance, 1),
+            }
+            for pk, distance, (bike_lat, bike_lon, device_id) in points
+        ]
+
+    def bicycle_saved(self, pk, device_id, status, latitude, longitude):
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            if status == "available" and latitude is not None and longitude is not None:
+                self._grid.upsert(pk, latitude, longitude, device_id)
+            else:
+                self._grid.remove(pk)
+
+    def moved(self, pk, latitude, longitude):
+        """Position update from the webhook; only bikes already indexed are affected."""
+        with self._lock:
+            point = self._grid.get(pk)
+            if point is not None:
+                self._grid.upsert(pk, latitude, longitude, point[2])
+
+    def deleted(self, pk):
+        with self._lock:
+            self._grid.remove(pk)
+
+    def clear(self):
+        with self._lock:
+            self._grid.clear()
+            self._loaded_at = None
+
+
+available_bikes = AvailableBikeIndex(
+    cell_deg=settings.NEAREST_GRID_CELL_DEG,
+    ttl=settings.NEAREST_INDEX_TTL,
+)
@@ -1,3 +1,435 @@
-from django.test import TestCase
+import threading
+import unittest
+from datetime import timedelta
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import close_old_connections, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .imports import run_next_import_job
+from .ingest import Uplink, UplinkQueue, apply_uplinks, mark_stale_offline, parse_uplink
+from .models import Bicycle, RentalLog, Reservation, UserProfile
+from .registry import device_registry
+from .rides import RideError, start_ride
+from .rfid import rfid_tags
+from .spatial import available_bikes
+from .views import WEBHOOK_TOKEN, DashboardView
+
+
+class FreshCachesMixin:
+    """Empty the process-wide caches so no test sees another test's rows."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        device_registry.clear()
+        available_bikes.clear()
+        rfid_tags.clear()
+
+
+# -------------------------------
+# Uplink parsing
+# -------------------------------
+class ParseUplinkTests(TestCase):
+    def uplink(self, latitude, longitude):
+        return {"deviceID": "D1", "payload": {"latitude": latitude, "longitude": longitude}}
+
+    def test_valid_uplink(self):
+        uplink, error = parse_uplink(self.uplink("6.9271", 79.8612))
+        self.assertIsNone(error)
+        self.assertEqual((uplink.device_id, uplink.latitude, uplink.longitude), ("D1", 6.9271, 79.8612))
+
+    def test_rejects_non_numbers(self):
+        for latitude in ("north", None, [1]):
+            uplink, error = parse_uplink(self.uplink(latitude, 79.8))
+            self.assertIsNone(uplink)
+            self.assertTrue(error)
+
+    def test_rejects_non_finite(self):
+        for value in ("nan", "NaN", "inf", "-inf", float("nan")):
+            with self.subTest(value=value):
+                self.assertIsNone(parse_uplink(self.uplink(value, 79.8))[0])
+                self.assertIsNone(parse_uplink(self.uplink(6.9, value))[0])
+
+    def test_rejects_out_of_range(self):
+        for latitude, longitude in ((90.0001, 0), (-91, 0), (0, 180.5), (0, -1e9), (1e300, 0)):
+            with self.subTest(latitude=latitude, longitude=longitude):
+                uplink, error = parse_uplink(self.uplink(latitude, longitude))
+                self.assertIsNone(uplink)
+                self.assertIn("within", error)
+
+    def test_accepts_the_bounds(self):
+        for latitude, longitude in ((90, 180), (-90, -180)):
+            self.assertIsNone(parse_uplink(self.uplink(latitude, longitude))[1])
+
+
+@override_settings(WEBHOOK_INGEST_MODE="sync")
+class WebhookValidationTests(FreshCachesMixin, TestCase):
+    url = "/api/webhook/enthutech/"
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {WEBHOOK_TOKEN}")
+        Bicycle.objects.create(device_id="D1", latitude=6.9, longitude=79.8)
+
+    def test_single_bad_uplink_is_a_400(self):
+        response = self.client.post(
+            self.url, {"deviceID": "D1", "payload": {"latitude": "nan", "longitude": 79.8}}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_bad_item_does_not_fail_the_batch(self):
+        response = self.client.post(self.url, [
+            {"deviceID": "D1", "payload": {"latitude": 7.2, "longitude": 80.6}},
+            {"deviceID": "D1", "payload": {"latitude": 1, "longitude": 1e9}},
+        ], format="json")
+        self.assertEqual(response.status_code, 200)
+        statuses = [result["status"] for result in response.data["results"]]
+        self.assertEqual(statuses, ["updated", "invalid"])
+        self.assertEqual(Bicycle.objects.get(device_id="D1").latitude, 7.2)
+
+
+# -------------------------------
+# Uplink writes
+# -------------------------------
+@override_settings(TELEMETRY_ENABLED=True)
+class ApplyUplinksTests(FreshCachesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.now = timezone.now()
+        self.bike = Bicycle.objects.create(device_id="D1", latitude=6.9, longitude=79.8)
+        Bicycle.objects.create(device_id="D2", latitude=6.9, longitude=79.8)
+
+    def test_guard_rejection_is_reported_stale(self):
+        device_registry.get_many({"D1"})  # cache the position_at as of now (None)
+        # Another process stores a newer position behind the registry's back
+        Bicycle.objects.filter(pk=self.bike.pk).update(latitude=7.5, position_at=self.now)
+
+        result = apply_uplinks([Uplink("D1", 8.0, 80.0, self.now - timedelta(minutes=1))])
+
+        self.assertEqual(result, [{"deviceID": "D1", "status": "stale"}])
+        self.bike.refresh_from_db()
+        self.assertEqual(self.bike.latitude, 7.5)
+        self.assertEqual(device_registry.get_many({"D1"})["D1"].position_at, self.now)
+
+    @mock.patch("api.ingest.close_old_connections")
+    def test_queue_retries_a_failed_batch_one_by_one(self, _):
+        uplink_queue = UplinkQueue(maxsize=10, batch_size=10, flush_interval=0, workers=0, put_timeout=0)
+        poisoned = Uplink("D2", float("nan"), 80.0, self.now)  # bypasses parse_uplink
+
+        uplink_queue._write([Uplink("D1", 8.0, 80.0, self.now), poisoned])
+
+        self.assertEqual(Bicycle.objects.get(device_id="D1").latitude, 8.0)
+        metrics = uplink_queue.metrics()
+        self.assertEqual((metrics["applied"], metrics["failed"]), (1, 1))
+
+
+# -------------------------------
+# Ride claims
+# -------------------------------
+class StartRideTests(FreshCachesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = User.objects.create_user("alice", password="pw")
+        self.bob = User.objects.create_user("bob", password="pw")
+        for device_id in ("B1", "B2"):
+            Bicycle.objects.create(device_id=device_id, latitude=6.9, longitude=79.8)
+
+    def assertRideError(self, status, user, device_id):
+        with self.assertRaises(RideError) as raised:
+            start_ride(user, device_id)
+        self.assertEqual(raised.exception.status_code, status)
+
+    def test_second_claim_on_a_bike_loses(self):
+        start_ride(self.alice, "B1")
+        self.assertRideError(404, self.bob, "B1")
+        self.assertEqual(RentalLog.objects.filter(status="ongoing").count(), 1)
+
+    def test_second_ride_of_a_user_rolls_back_its_claim(self):
+        start_ride(self.alice, "B1")
+        # The claim of B2 succeeds, the rental insert hits rental_one_ongoing_per_user
+        self.assertRideError(400, self.alice, "B2")
+        self.assertEqual(Bicycle.objects.get(device_id="B2").status, "available")
+
+    def test_constraint_backs_up_a_stale_bike_status(self):
+        # B1 says available but already has an ongoing rental (e.g. an admin edit)
+        RentalLog.objects.create(user=self.alice, bicycle=Bicycle.objects.get(device_id="B1"))
+        self.assertRideError(409, self.bob, "B1")
+        self.assertEqual(Bicycle.objects.get(device_id="B1").status, "available")
+
+    def test_expired_hold_is_released_on_the_spot(self):
+        bike = Bicycle.objects.get(device_id="B1")
+        Bicycle.objects.filter(pk=bike.pk).update(status="reserved")
+        Reservation.objects.create(user=self.alice, bicycle=bike, expiry_at=timezone.now() - timedelta(seconds=1))
+
+        start_ride(self.bob, "B1")
+
+        self.assertEqual(Reservation.objects.get().status, "expired")
+        self.assertEqual(RentalLog.objects.get(status="ongoing").user, self.bob)
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "needs concurrent writers (PostgreSQL)")
+class StartRideRaceTests(FreshCachesMixin, TransactionTestCase):
+    def test_one_of_many_concurrent_claims_wins(self):
+        Bicycle.objects.create(device_id="B1", latitude=6.9, longitude=79.8)
+        users = [User.objects.create_user(f"rider{i}", password="pw") for i in range(8)]
+        barrier = threading.Barrier(len(users))
+        outcomes = []
+
+        def ride(user):
+            barrier.wait()
+            try:
+                start_ride(user, "B1")
+                outcomes.append(201)
+            except RideError as e:
+                outcomes.append(e.status_code)
+            finally:
+                close_old_connections()
+
+        threads = [threading.Thread(target=ride, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(outcomes), [201] + [404] * (len(users) - 1))
+        self.assertEqual(RentalLog.objects.filter(status="ongoing").count(), 1)
+
+
+# -------------------------------
+# Fleet ETags
+# -------------------------------
+class FleetETagTests(FreshCachesMixin, TestCase):
+    url = "/api/user/bicycles/"
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("rider", password="pw"))
+        Bicycle.objects.create(device_id="B1", latitude=6.9, longitude=79.8)
+
+    def get(self, etag=None):
+        return self.client.get(self.url, HTTP_IF_NONE_MATCH=etag) if etag else self.client.get(self.url)
+
+    def test_unchanged_fleet_is_a_304(self):
+        first = self.get()
+        self.assertEqual(first.status_code, 200)
+        again = self.get(first["ETag"])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again["ETag"], first["ETag"])
+
+    def test_offline_sweep_changes_the_etag(self):
+        etag = self.get()["ETag"]
+        # The sweeper leaves last_update alone; offline_since must still bump the version
+        self.assertEqual(mark_stale_offline(now=timezone.now() + timedelta(hours=1)), 1)
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+# -------------------------------
+# Dashboard
+# -------------------------------
+class DashboardStatsTests(TestCase):
+    def test_stats_are_one_query(self):
+        rider = User.objects.create_user("rider", password="pw")
+        User.objects.create_user("staff", password="pw", is_staff=True)
+        User.objects.create_user("gone", password="pw", is_active=False)
+        bikes = [
+            Bicycle.objects.create(device_id=f"B{i}", status=status)
+            for i, status in enumerate(["available", "available", "offline", "in_use"])
+        ]
+        RentalLog.objects.create(user=rider, bicycle=bikes[3], status="ongoing")
+
+        with self.assertNumQueries(1):
+            stats = DashboardView.build_stats()
+        self.assertEqual(stats, {
+            "totalBikes": 4, "available": 2, "ongoingRentals": 1, "offline": 1, "activeUsers": 1,
+        })
+
+    def test_stats_without_bikes(self):
+        User.objects.create_user("rider", password="pw")
+        self.assertEqual(DashboardView.build_stats(), {
+            "totalBikes": 0, "available": 0, "ongoingRentals": 0, "offline": 0, "activeUsers": 1,
+        })
+
+
+# -------------------------------
+# Rental logs
+# -------------------------------
+class AdminRentalLogTests(TestCase):
+    url = "/api/admin/rentals/"
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser("admin", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.users = [User.objects.create_user(name, password="pw") for name in ("alice", "bob")]
+        self.bikes = [Bicycle.objects.create(device_id=f"BK-{i}") for i in range(3)]
+        now = timezone.now()
+        for i in range(6):
+            RentalLog.objects.create(
+                user=self.users[i % 2], bicycle=self.bikes[i % 3], status="completed",
+                start_time=now - timedelta(hours=i), end_time=now,
+            )
+
+    def usernames(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return [row["user"]["username"] for row in response.data["results"]]
+
+    def test_search_matches_username_or_device(self):
+        self.assertEqual(set(self.usernames(search="ALI")), {"alice"})
+        self.assertEqual(len(self.usernames(search="ali")), 3)
+        self.assertEqual(len(self.usernames(search="bk-2")), 2)
+        self.assertEqual(self.usernames(search="nobody"), [])
+
+    def test_cursor_pages_cover_every_log_once(self):
+        # Two more rentals sharing one start_time, to page through a tie
+        tied = timezone.now() - timedelta(hours=3)
+        for user in self.users:
+            RentalLog.objects.create(user=user, bicycle=self.bikes[0], status="completed",
+                                     start_time=tied, end_time=tied)
+        expected = list(RentalLog.objects.order_by("-start_time", "-id").values_list("id", flat=True))
+
+        seen, params = [], {"page_size": 3}
+        while True:
+            response = self.client.get(self.url, params)
+            seen += [row["id"] for row in response.data["results"]]
+            if not response.data["next"]:
+                break
+            params = {"page_size": 3, "cursor": parse_qs(urlsplit(response.data["next"]).query)["cursor"][0]}
+        self.assertEqual(seen, expected)
+
+    def test_search_is_ignored_for_regular_users(self):
+        self.client.force_authenticate(self.users[0])
+        response = self.client.get("/api/rentals/", {"search": "bob"})
+        self.assertEqual(len(response.data["results"]), 3)
+
+
+class RentalExportTests(TestCase):
+    url = "/api/admin/rentals/export/"
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser("admin", password="pw")
+        bike = Bicycle.objects.create(device_id="BK-1")
+        now = timezone.now()
+        for i in range(5):
+            RentalLog.objects.create(
+                user=self.admin, bicycle=bike, status="completed",
+                start_time=now - timedelta(hours=i), end_time=now,
+            )
+        self.headers = {"Authorization": f"Bearer {AccessToken.for_user(self.admin)}"}
+
+    def test_streams_under_wsgi(self):
+        response = self.client.get(self.url, {"output": "ndjson"}, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.is_async)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 5)
+
+    @override_settings(RENTAL_EXPORT_CHUNK_SIZE=2)
+    async def test_streams_under_asgi(self):
+        response = await self.async_client.get(self.url, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        # An async iterator: Django does not buffer the export with sync_to_async(list)
+        self.assertTrue(response.is_async)
+        chunks = [chunk async for chunk in response.streaming_content]
+        self.assertEqual(len(chunks), 3)  # header + 5 rows in chunks of 2 lines
+        lines = b"".join(chunks).decode().splitlines()
+        self.assertEqual(lines[0].split(",")[:3], ["id", "user_id", "username"])
+        self.assertEqual(len(lines), 6)
+
+
+# -------------------------------
+# RFID taps and Idempotency-Key
+# -------------------------------
+@override_settings(RFID_DEVICE_TOKEN="kiosk-secret")
+class RfidTapIdempotencyTests(FreshCachesMixin, TestCase):
+    url = "/api/rfid/tap/"
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer kiosk-secret")
+        for name, tag, device_id in (("alice", "TAG-A", "B1"), ("bob", "TAG-B", "B2")):
+            user = User.objects.create_user(name, password="pw")
+            UserProfile.objects.filter(user=user).update(rfid_tag=tag)
+            Bicycle.objects.create(device_id=device_id, latitude=6.9, longitude=79.8)
+
+    def tap(self, tag, device_id, key="retry-1"):
+        return self.client.post(self.url, {"rfid_tag": tag, "device_id": device_id},
+                                format="json", HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_from_the_same_reader_is_replayed(self):
+        first = self.tap("TAG-A", "B1")
+        retry = self.tap("TAG-A", "B1")
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual((retry.status_code, retry.data), (201, first.data))
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(RentalLog.objects.count(), 1)
+
+    def test_readers_do_not_share_keys(self):
+        alice, bob = self.tap("TAG-A", "B1"), self.tap("TAG-B", "B2")
+        self.assertEqual((alice.status_code, bob.status_code), (201, 201))
+        self.assertFalse(bob.has_header("Idempotent-Replayed"))
+        self.assertEqual(
+            set(RentalLog.objects.filter(status="ongoing").values_list("bicycle__device_id", flat=True)),
+            {"B1", "B2"},
+        )
+
+
+# -------------------------------
+# Bulk user import
+# -------------------------------
+@override_settings(
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+    USER_IMPORT_INLINE_PASSWORDS=2,
+    USER_IMPORT_MAX_ROWS=5,
+)
+class UserImportTests(FreshCachesMixin, TestCase):
+    url = "/api/users/import/"
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_superuser("admin", password="pw"))
+
+    def rows(self, n, password="secret"):
+        return [{"username": f"student{i}", "password": password, "rfid_tag": f"T{i}"} for i in range(n)]
+
+    def test_too_many_rows_is_a_413(self):
+        response = self.client.post(self.url, self.rows(6), format="json")
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(User.objects.filter(username__startswith="student").exists())
+
+    def test_small_import_runs_inline(self):
+        response = self.client.post(self.url, self.rows(2), format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["created"], 2)
+        self.assertTrue(User.objects.get(username="student1").check_password("secret"))
+
+    def test_large_import_is_queued_for_the_worker(self):
+        rows = self.rows(4) + [{"username": "bad name!", "password": "x"}]
+        response = self.client.post(self.url, rows, format="json")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual((response.data["status"], response.data["total"]), ("pending", 5))
+        self.assertFalse(User.objects.filter(username__startswith="student").exists())
+
+        job = run_next_import_job(workers=1)
+        self.assertEqual((job.status, job.created, job.rows), ("done", 4, []))
+        self.assertIsNone(run_next_import_job(workers=1))
+        self.assertTrue(User.objects.get(username="student3").check_password("secret"))
+        self.assertEqual(UserProfile.objects.get(user__username="student3").rfid_tag, "T3")
+
+        status = self.client.get(f"{self.url}{job.id}/")
+        self.assertEqual((status.status_code, status.data["status"], status.data["created"]), (200, "done", 4))
+        self.assertEqual([error["row"] for error in status.data["errors"]], [5])
+        self.assertNotIn("rows", status.data)
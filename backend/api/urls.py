@@ -2,10 +2,10 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     AdminOnlyView, UserOnlyView,
-    BicycleListView, ReservationCreateView, ReservationListView, RentalListView,
+    BicycleListView, ReservationCreateView, ReservationCancelView, ReservationListView, RentalListView,
     UserProfileViewSet, DashboardView,
-    BicycleViewSet, UserViewSet, EnthuTechWebhookView, AdminRentalLogView, UserRentalAPIView, UserRentalHistoryAPIView,
-    UserProfileDetailAPIView,
+    BicycleViewSet, UserViewSet, EnthuTechWebhookView, WebhookMetricsView, AdminRentalLogView, AdminRentalExportView, UserRentalAPIView, UserRentalHistoryAPIView, NearestBicycleAPIView,
+    UserProfileDetailAPIView, RfidTapView, bicycle_stream,
 )
 
 router = DefaultRouter()
@@ -17,22 +17,30 @@ urlpatterns = [
     path("admin-only/", AdminOnlyView.as_view(), name="admin-only"),
     path("user-only/", UserOnlyView.as_view(), name="user-only"),
     
-    # path("reservations/", ReservationCreateView.as_view(), name="reservation-create"),
-    # path("reservations/mine/", ReservationListView.as_view(), name="reservation-list"),
+    path("reservations/", ReservationCreateView.as_view(), name="reservation-create"),
+    path("reservations/mine/", ReservationListView.as_view(), name="reservation-list"),
+    path("reservations/<int:pk>/cancel/", ReservationCancelView.as_view(), name="reservation-cancel"),
     
     # admin views
     path("rentals/", RentalListView.as_view(), name="rental-list"),
     path("dashboard/", DashboardView.as_view(), name="dashboard"),
     path("admin/rentals/", AdminRentalLogView.as_view(), name="admin-rental-log"),
+    path("admin/rentals/export/", AdminRentalExportView.as_view(), name="admin-rental-export"),
     
     # User views
+    path("user/bicycles/nearest/", NearestBicycleAPIView.as_view(), name="user-bicycles-nearest"),
     path("user/bicycles/", UserRentalAPIView.as_view(), name="user-bicycles"),          
     path("user/rentals/", UserRentalAPIView.as_view(), name="user-rentals"),
     path("user/rentals/history/", UserRentalHistoryAPIView.as_view(), name="user-rental-history"), 
     path("user/profile/", UserProfileDetailAPIView.as_view(), name="user-profile-detail"),
 
     
+    path("stream/bicycles/", bicycle_stream, name="bicycle-stream"),
+
+    path("rfid/tap/", RfidTapView.as_view(), name="rfid-tap"),
+
     path("webhook/enthutech/", EnthuTechWebhookView.as_view(), name="enthutech-webhook"),
+    path("webhook/enthutech/metrics/", WebhookMetricsView.as_view(), name="enthutech-webhook-metrics"),
     
     path("", include(router.urls)),
 ]
@@ -6,8 +6,9 @@ from rest_framework.decorators import action
 from rest_framework_simplejwt.views import TokenObtainPairView
 from django.contrib.auth.models import User
 from django.utils import timezone
-from datetime import timedelta
-from django.db.models import Count
+from datetime import datetime, timedelta
+from django.db.models import Avg, Count, F, Func, IntegerField, Max, Q, Subquery, Sum, Value
+from django.db.models.functions import Floor
 from .serializers import (
     CustomTokenObtainPairSerializer,
     UserSerializer,
@@ -17,13 +18,38 @@ from .serializers import (
     RentalLogSerializer,
     UserProfileSerializer,
     DashboardRecentRentalSerializer,
+    UserImportJobSerializer,
+    flatten_rentals,
+    rental_rows,
 )
-from .models import Bicycle, Reservation, RentalLog, UserProfile
+from .models import Bicycle, BicycleTombstone, Reservation, RentalDailyRollup, RentalLog, UserImportJob, UserProfile
 from .permissions import IsAdminUser, IsRegularUser
+from .pagination import RentalCursorPagination
+from .ingest import parse_uplink, apply_uplinks, get_uplink_queue, get_coalescing_buffer, write_stats
+from .registry import device_registry
+from .spatial import available_bikes
+from .events import change_feed, changed_bicycles, format_event
+from .fleet import fleet_version
+from .dashboard import get_section
+from .exports import EXPORT_FORMATS, aiter_chunks, export_rentals
+from .imports import count_passwords, import_users, parse_import, queue_import
+from .rollups import contribution, record_rental_change
+from .rides import RideError, complete_ride, start_ride
+from .idempotency import IdempotencyMixin, _digest
+from .authentication import CachedJWTAuthentication
+from .reservations import cancel_reservation, reserve_bike
+from .rfid import rfid_tags
 from django.conf import settings
-from rest_framework.exceptions import NotFound
-
-from django.db import transaction
+from rest_framework.exceptions import AuthenticationFailed, NotFound, ValidationError
+
+from django.db import IntegrityError, transaction
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_date, parse_datetime
+from asgiref.sync import sync_to_async
+from rest_framework_simplejwt.exceptions import InvalidToken
+import asyncio
+import hmac
 import os
 
 # WEBHOOK INTEGRATION VIEW
@@ -31,6 +57,19 @@ import os
 WEBHOOK_TOKEN = os.environ.get("WEBHOOK_TOKEN", "Pj8cXx1aXH4aU4F0gE4g1SxGmLw6v0Yn_BYr7E8pP3A")
 
 class EnthuTechWebhookView(APIView):
+    """
+    POST /api/webhook/enthutech/
+
+    Accepts either a single uplink:
+        {"deviceID": "<id>", "payload": {"latitude": .., "longitude": ..}}
+    or a batch of them, as a JSON array or {"uplinks": [...]}.
+    Batches are written in one transaction and answered with a per-item result list.
+
+    With WEBHOOK_INGEST_MODE = "queue" uplinks are only validated here, handed to
+    the background UplinkQueue and answered with 202; a full queue answers 503.
+    With "coalesce" they go to the CoalescingBuffer, which keeps only the newest
+    position per device until its next flush, and are also answered with 202.
+    """
     authentication_classes = []
     permission_classes = [AllowAny]
 
@@ -41,42 +80,137 @@ class EnthuTechWebhookView(APIView):
             return Response({"error": "Unauthorized"}, status=status.HTTP_401_UNAUTHORIZED)
 
         data = request.data
-        print("Received Webhook Data:", data)
 
-        # 2️⃣ Extract required fields
-        device_id = data.get("deviceID")
-        payload = data.get("payload", {})
+        if isinstance(data, list) or "uplinks" in data:
+            return self.post_batch(data if isinstance(data, list) else data.get("uplinks"))
 
-        if not device_id:
-            return Response({"error": "Missing deviceID"}, status=status.HTTP_400_BAD_REQUEST)
+        print("Received Webhook Data:", data)
 
-        # 3️⃣ Extract latitude & longitude from payload
-        latitude = payload.get("latitude")
-        longitude = payload.get("longitude")
+        # 2️⃣ Validate deviceID, latitude & longitude
+        uplink, error = parse_uplink(data)
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
 
-        if latitude is None or longitude is None:
-            return Response({"error": "Payload must include 'latitude' and 'longitude'"},
-                            status=status.HTTP_400_BAD_REQUEST)
+        if settings.WEBHOOK_INGEST_MODE == "queue":
+            if not get_uplink_queue().put([uplink]):
+                return self.queue_full_response()
+            return Response(
+                {"status": "accepted", "message": "Location queued"},
+                status=status.HTTP_202_ACCEPTED
+            )
 
-        # 4️⃣ Update the matching bicycle
-        try:
-            bicycle = Bicycle.objects.get(device_id=device_id)
-        except Bicycle.DoesNotExist:
-            return Response({"error": f"No bicycle found with device_id {device_id}"},
+        if settings.WEBHOOK_INGEST_MODE == "coalesce":
+            get_coalescing_buffer().add([uplink])
+            return Response(
+                {"status": "accepted", "message": "Location buffered"},
+                status=status.HTTP_202_ACCEPTED
+            )
+
+        # 3️⃣ Update the matching bicycle
+        result = apply_uplinks([uplink])[0]
+        if result["status"] == "not_found":
+            return Response({"error": f"No bicycle found with device_id {uplink.device_id}"},
                             status=status.HTTP_404_NOT_FOUND)
 
-        bicycle.latitude = latitude
-        bicycle.longitude = longitude
-        bicycle.save()
+        if result["status"] == "stale":
+            return Response(
+                {"status": "success", "message": "Stale location ignored"},
+                status=status.HTTP_200_OK
+            )
+
+        if result["status"] == "unchanged":
+            return Response(
+                {"status": "success", "message": "Location unchanged"},
+                status=status.HTTP_200_OK
+            )
 
-        print(f"Updated {device_id}: lat={latitude}, lon={longitude}")
+        print(f"Updated {uplink.device_id}: lat={uplink.latitude}, lon={uplink.longitude}")
 
-        # 5️⃣ Always return 200 OK for successful processing
+        # 4️⃣ Always return 200 OK for successful processing
         return Response(
             {"status": "success", "message": "Location updated"},
             status=status.HTTP_200_OK
         )
 
+    def post_batch(self, items):
+        if not isinstance(items, list) or not items:
+            return Response({"error": "Batch must be a non-empty list of uplinks"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        if len(items) > settings.WEBHOOK_MAX_BATCH_SIZE:
+            return Response({"error": f"Batch exceeds {settings.WEBHOOK_MAX_BATCH_SIZE} uplinks"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        results = [None] * len(items)
+        uplinks, positions = [], []
+        for i, item in enumerate(items):
+            uplink, error = parse_uplink(item)
+            if error:
+                device_id = item.get("deviceID") if isinstance(item, dict) else None
+                results[i] = {"deviceID": device_id, "status": "invalid", "error": error}
+            else:
+                uplinks.append(uplink)
+                positions.append(i)
+
+        if settings.WEBHOOK_INGEST_MODE == "queue":
+            accepted = get_uplink_queue().put(uplinks)
+            if uplinks and not accepted:
+                return self.queue_full_response()
+            for n, i in enumerate(positions):
+                results[i] = {"deviceID": uplinks[n].device_id,
+                              "status": "queued" if n < accepted else "rejected"}
+            return Response(
+                {"status": "accepted", "queued": accepted, "results": results},
+                status=status.HTTP_202_ACCEPTED
+            )
+
+        if settings.WEBHOOK_INGEST_MODE == "coalesce":
+            get_coalescing_buffer().add(uplinks)
+            for n, i in enumerate(positions):
+                results[i] = {"deviceID": uplinks[n].device_id, "status": "buffered"}
+            return Response(
+                {"status": "accepted", "buffered": len(uplinks), "results": results},
+                status=status.HTTP_202_ACCEPTED
+            )
+
+        for i, result in zip(positions, apply_uplinks(uplinks)):
+            results[i] = result
+
+        updated = sum(1 for r in results if r["status"] == "updated")
+        print(f"Webhook batch: {updated}/{len(items)} uplinks applied")
+
+        return Response(
+            {"status": "success", "updated": updated, "results": results},
+            status=status.HTTP_200_OK
+        )
+
+    def queue_full_response(self):
+        return Response(
+            {"error": "Ingest queue is full, retry later"},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={"Retry-After": "1"},
+        )
+
+
+class WebhookMetricsView(APIView):
+    """
+    GET /api/webhook/enthutech/metrics/
+    Admin-only snapshot of the ingest queue (depth, enqueued, rejected, ...),
+    the coalescing buffer (pending, merged, stale, ...), the position
+    writes applied versus skipped as jitter and the device registry.
+    """
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            "mode": settings.WEBHOOK_INGEST_MODE,
+            "queue": get_uplink_queue().metrics(),
+            "coalesce": get_coalescing_buffer().metrics(),
+            "writes": write_stats.snapshot(),
+            "registry": device_registry.metrics(),
+        }, status=status.HTTP_200_OK)
+
 
 # -------------------------------
 # Authentication & Role Views
@@ -112,15 +246,40 @@ class UserOnlyView(APIView):
 class BicycleListView(generics.ListAPIView):
     queryset = Bicycle.objects.all().order_by('device_id')
     serializer_class = BicycleSerializer
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
 
 class ReservationCreateView(generics.CreateAPIView):
+    """
+    POST /api/reservations/   {"bicycle": "<device_id>"}
+    Holds an available bike for the user until expiry_at; starting a ride on
+    it (POST /api/user/rentals/) confirms the reservation.
+    """
     serializer_class = ReservationSerializer
     permission_classes = [IsAuthenticated]
 
-    def perform_create(self, serializer):
-        serializer.save()
+    def create(self, request, *args, **kwargs):
+        device_id = request.data.get("bicycle")
+        if not device_id:
+            return Response({"error": "'bicycle' (device_id) is required."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            reservation = reserve_bike(request.user, device_id)
+        except RideError as e:
+            return Response({"error": e.message}, status=e.status_code)
+        return Response(self.get_serializer(reservation).data, status=status.HTTP_201_CREATED)
+
+
+class ReservationCancelView(APIView):
+    """POST /api/reservations/<id>/cancel/ — release the user's pending reservation."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        try:
+            cancel_reservation(request.user, pk)
+        except RideError as e:
+            return Response({"error": e.message}, status=e.status_code)
+        return Response({"message": "Reservation cancelled.", "reservation_id": pk}, status=status.HTTP_200_OK)
 
 
 class ReservationListView(generics.ListAPIView):
@@ -128,14 +287,96 @@ class ReservationListView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Reservation.objects.filter(user=self.request.user).order_by('-reserved_at')
+        return (
+            Reservation.objects
+            .filter(user_id=self.request.user.id)
+            .select_related('bicycle')
+            .order_by('-reserved_at')
+        )
+
 
+class RentalLogFilterMixin:
+    """
+    Filters and cursor pagination shared by the rental log endpoints:
+    ?status=ongoing|completed  ?bike=<device_id>  ?user=<user id> (admins only)
+    ?search=<text> (admins only; part of the username or device ID)
+    ?from=/?to= (ISO date or datetime on start_time; a date `to` includes that day)
+    ?page_size=  ?cursor=
+    """
+    pagination_class = RentalCursorPagination
 
-class RentalListView(generics.ListAPIView):
-    queryset = RentalLog.objects.all().order_by('-start_time')
+    def parse_start_bound(self, name):
+        """Return (aware datetime, whole_day) for ?<name>=, or (None, False) if absent."""
+        raw = self.request.query_params.get(name)
+        if not raw:
+            return None, False
+        try:
+            day = parse_date(raw)
+            value = datetime.combine(day, datetime.min.time()) if day else parse_datetime(raw)
+        except ValueError:
+            value = day = None
+        if value is None:
+            raise ValidationError({"error": f"'{name}' must be an ISO date or datetime."})
+        if timezone.is_naive(value):
+            value = timezone.make_aware(value)
+        return value, day is not None
+
+    def filter_rentals(self, queryset):
+        params = self.request.query_params
+
+        rental_status = params.get('status')
+        if rental_status:
+            if rental_status not in ('ongoing', 'completed'):
+                raise ValidationError({"error": "'status' must be 'ongoing' or 'completed'."})
+            queryset = queryset.filter(status=rental_status)
+
+        if params.get('bike'):
+            queryset = queryset.filter(bicycle__device_id=params['bike'])
+
+        if self.request.user.is_staff and params.get('user'):
+            try:
+                queryset = queryset.filter(user_id=int(params['user']))
+            except ValueError:
+                raise ValidationError({"error": "'user' must be a user id."})
+
+        search = params.get('search', '').strip()
+        if self.request.user.is_staff and search:
+            queryset = queryset.filter(
+                Q(user__username__icontains=search) | Q(bicycle__device_id__icontains=search)
+            )
+
+        start, _ = self.parse_start_bound('from')
+        if start is not None:
+            queryset = queryset.filter(start_time__gte=start)
+        end, whole_day = self.parse_start_bound('to')
+        if whole_day:
+            queryset = queryset.filter(start_time__lt=end + timedelta(days=1))
+        elif end is not None:
+            queryset = queryset.filter(start_time__lte=end)
+        return queryset
+
+    def paginated_rentals(self, queryset):
+        """Filter and paginate, then build RentalLogSerializer-shaped rows straight from values()."""
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(rental_rows(self.filter_rentals(queryset)), self.request, view=self)
+        return paginator.get_paginated_response(flatten_rentals(page))
+
+
+class RentalListView(RentalLogFilterMixin, generics.ListAPIView):
+    """Rental logs: all of them for admins, only their own for regular users."""
     serializer_class = RentalLogSerializer
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
+    def get_queryset(self):
+        queryset = RentalLog.objects.all()
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(user_id=self.request.user.id)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        return self.paginated_rentals(self.get_queryset())
+
 
 # -------------------------------
 # UserProfile management (Admin-only)
@@ -149,53 +390,134 @@ class UserProfileViewSet(viewsets.ModelViewSet):
 # -------------------------------
 # Dashboard API
 # -------------------------------
+def _scalar_count(queryset):
+    """Scalar COUNT(*) subquery over `queryset`, usable inside another aggregate()."""
+    counted = queryset.order_by().annotate(_n=Func(F("pk"), function="COUNT")).values("_n")
+    return Max(Subquery(counted, output_field=IntegerField()))
+
+
+WEEKDAY_LABELS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+
 class DashboardView(APIView):
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
-    def get(self, request, format=None):
-        now = timezone.now()
-        total_bikes = Bicycle.objects.count()
-        available_bikes = Bicycle.objects.filter(status='available').count()
-        ongoing_rentals = RentalLog.objects.filter(status__iexact='ongoing').count()
-        offline_bikes = Bicycle.objects.filter(status='offline').count()
-        active_users = User.objects.filter(is_active=True, is_staff=False).count()
-
-        stats = {
-            "totalBikes": total_bikes,
-            "available": available_bikes,
-            "ongoingRentals": ongoing_rentals,
-            "offline": offline_bikes,
-            "activeUsers": active_users,
+    @staticmethod
+    def build_stats():
+        # One query: conditional counts over the fleet, with the rental and user
+        # counts as scalar subqueries riding along on the same aggregate
+        stats = Bicycle.objects.aggregate(
+            totalBikes=Count("id"),
+            available=Count("id", filter=Q(status="available")),
+            offline=Count("id", filter=Q(status="offline")),
+            ongoingRentals=_scalar_count(RentalLog.objects.filter(status="ongoing")),
+            activeUsers=_scalar_count(User.objects.filter(is_active=True, is_staff=False)),
+        )
+        if not stats["totalBikes"]:
+            # No bike rows for the subqueries to ride on (and so no rentals either)
+            stats["ongoingRentals"] = 0
+            stats["activeUsers"] = User.objects.filter(is_active=True, is_staff=False).count()
+        return {
+            key: stats[key]
+            for key in ("totalBikes", "available", "ongoingRentals", "offline", "activeUsers")
         }
 
-        start_date = (now - timedelta(days=6)).date()
-        end_date = now.date()
-        weekday_counts = {i: 0 for i in range(7)}
-        rentals_last_7_days = RentalLog.objects.filter(start_time__date__gte=start_date, start_time__date__lte=end_date)
-
-        for r in rentals_last_7_days:
-            weekday_idx = r.start_time.weekday()
-            weekday_counts[weekday_idx] += 1
+    @staticmethod
+    def build_weekly_rentals(now):
+        # Read from the daily rollup so the cost is bikes x 7 days, not the week's rentals
+        end_date = timezone.localdate(now)
+        per_day = (
+            RentalDailyRollup.objects
+            .filter(date__gte=end_date - timedelta(days=6), date__lte=end_date)
+            .values("date")
+            .annotate(rentals=Sum("rentals"))
+            .order_by()
+        )
 
-        weekday_labels = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
-        weekly_rentals = [{"day": weekday_labels[i], "rentals": weekday_counts.get(i, 0)} for i in range(7)]
+        weekday_counts = {i: 0 for i in range(7)}
+        for row in per_day:
+            weekday_counts[row["date"].weekday()] += row["rentals"]
+        return [{"day": WEEKDAY_LABELS[i], "rentals": weekday_counts[i]} for i in range(7)]
 
+    @staticmethod
+    def build_recent_rentals():
         recent_qs = RentalLog.objects.select_related('user', 'bicycle').order_by('-start_time')[:4]
-        recent_serialized = DashboardRecentRentalSerializer(recent_qs, many=True).data
+        return list(DashboardRecentRentalSerializer(recent_qs, many=True).data)
 
+    def get(self, request, format=None):
+        # Each section is cached separately and invalidated by api/signals.py
         return Response({
-            "stats": stats,
-            "weeklyRentals": weekly_rentals,
-            "recentRentals": recent_serialized
+            "stats": get_section("stats", self.build_stats),
+            "weeklyRentals": get_section("weeklyRentals", lambda: self.build_weekly_rentals(timezone.now())),
+            "recentRentals": get_section("recentRentals", self.build_recent_rentals),
         })
 
 
+# -------------------------------
+# Delta sync & conditional GET for bicycle lists
+# -------------------------------
+class FleetSyncMixin:
+    """
+    Shared by the bicycle list endpoints:
+    - ETag from fleet_version() (index lookups only); If-None-Match answers 304
+      without reading the bicycles themselves.
+    - ?since=<cursor> returns {"bicycles", "deleted", "cursor"}: every bike whose
+      last_update (or offline_since) is newer than the cursor (whatever the
+      endpoint's filter, so clients can drop bikes that left their set) plus
+      tombstones of deleted bikes.
+    Every response carries X-Sync-Cursor, the value to pass as the next `since`.
+    """
+
+    def fleet_response(self, request, build_response):
+        etag = f'W/"fleet-{fleet_version()}"'
+        if etag in request.headers.get("If-None-Match", ""):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+        # Re-read a little before "now" next time to catch late-committing writes
+        cursor = timezone.now() - timedelta(seconds=settings.BICYCLE_STREAM_LOOKBACK)
+        cursor = cursor.isoformat().replace("+00:00", "Z")
+
+        since = request.query_params.get("since")
+        if since is not None:
+            since_at = parse_datetime(since)
+            if since_at is None:
+                return Response({"error": "'since' must be an ISO-8601 timestamp."},
+                                status=status.HTTP_400_BAD_REQUEST)
+            changed = (
+                Bicycle.objects
+                .filter(Q(last_update__gt=since_at) | Q(offline_since__gt=since_at))
+                .order_by("device_id")
+            )
+            deleted = BicycleTombstone.objects.filter(deleted_at__gt=since_at).values("bicycle_id", "device_id")
+            response = Response({
+                "bicycles": BicycleSerializer(changed, many=True).data,
+                "deleted": [{"id": d["bicycle_id"], "device_id": d["device_id"]} for d in deleted],
+                "cursor": cursor,
+            }, status=status.HTTP_200_OK)
+        else:
+            response = build_response()
+
+        response["ETag"] = etag
+        response["X-Sync-Cursor"] = cursor
+        return response
+
+
 # -------------------------------
 # Bicycle CRUD ViewSet (Admin-only)
 # -------------------------------
-class BicycleViewSet(viewsets.ModelViewSet):
+class BicycleViewSet(FleetSyncMixin, viewsets.ModelViewSet):
+    """
+    GET /api/bicycles/ (and /available/) support ?since= and ETags, see FleetSyncMixin.
+    GET /api/bicycles/ also accepts:
+    - bbox=minLon,minLat,maxLon,maxLat → only bikes inside the viewport
+    - zoom=<0-22> → below BICYCLE_CLUSTER_MAX_ZOOM, aggregated clusters
+      ({"zoom", "clusters": [{latitude, longitude, count, available}]})
+      instead of individual bikes
+    """
     queryset = Bicycle.objects.all().order_by('device_id')
     serializer_class = BicycleSerializer
+    authentication_classes = [CachedJWTAuthentication]
 
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
@@ -204,11 +526,90 @@ class BicycleViewSet(viewsets.ModelViewSet):
             permission_classes = [IsAuthenticated]
         return [perm() for perm in permission_classes]
 
+    def parse_bbox(self):
+        raw = self.request.query_params.get('bbox')
+        if not raw:
+            return None
+        try:
+            min_lon, min_lat, max_lon, max_lat = (float(v) for v in raw.split(','))
+        except ValueError:
+            raise ValidationError({"error": "'bbox' must be minLon,minLat,maxLon,maxLat."})
+        if min_lat > max_lat:
+            raise ValidationError({"error": "'bbox' minLat must not exceed maxLat."})
+        return min_lon, min_lat, max_lon, max_lat
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action != 'list':
+            return queryset
+
+        bbox = self.parse_bbox()
+        if bbox is None:
+            return queryset
+
+        min_lon, min_lat, max_lon, max_lat = bbox
+        queryset = queryset.filter(latitude__gte=min_lat, latitude__lte=max_lat)
+        if min_lon <= max_lon:
+            return queryset.filter(longitude__gte=min_lon, longitude__lte=max_lon)
+        # Viewport crossing the antimeridian
+        return queryset.filter(Q(longitude__gte=min_lon) | Q(longitude__lte=max_lon))
+
+    def list(self, request, *args, **kwargs):
+        return self.fleet_response(request, lambda: self.list_bicycles(request, *args, **kwargs))
+
+    def list_bicycles(self, request, *args, **kwargs):
+        zoom = request.query_params.get('zoom')
+        if zoom is None:
+            return super().list(request, *args, **kwargs)
+
+        try:
+            zoom = int(zoom)
+        except ValueError:
+            return Response({"error": "'zoom' must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if zoom >= settings.BICYCLE_CLUSTER_MAX_ZOOM:
+            return super().list(request, *args, **kwargs)
+
+        # One cluster cell is a quarter of a 256px web-map tile at this zoom
+        cell = 360.0 / (2 ** max(zoom, 0)) / 4
+        clusters = (
+            self.get_queryset()
+            .filter(latitude__isnull=False, longitude__isnull=False)
+            .annotate(
+                cell_y=Floor(F('latitude') / Value(cell)),
+                cell_x=Floor(F('longitude') / Value(cell)),
+            )
+            .order_by()
+            .values('cell_y', 'cell_x')
+            .annotate(
+                latitude=Avg('latitude'),
+                longitude=Avg('longitude'),
+                count=Count('id'),
+                available=Count('id', filter=Q(status='available')),
+            )
+        )
+
+        return Response({
+            "zoom": zoom,
+            "clusters": [
+                {
+                    "latitude": c["latitude"],
+                    "longitude": c["longitude"],
+                    "count": c["count"],
+                    "available": c["available"],
+                }
+                for c in clusters
+            ],
+        })
+
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def available(self, request):
-        queryset = Bicycle.objects.filter(status='available')
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        def build_response():
+            queryset = Bicycle.objects.filter(status='available')
+            serializer = self.get_serializer(queryset, many=True)
+            return Response(serializer.data)
+
+        return self.fleet_response(request, build_response)
 
 
 # -------------------------------
@@ -236,21 +637,72 @@ class UserViewSet(viewsets.ModelViewSet):
         self.perform_destroy(instance)
         return Response({"message": f"User '{username}' deleted successfully."}, status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=['post'], url_path='import')
+    def bulk_import(self, request):
+        """
+        POST /api/users/import/
+        Either a multipart upload ("file": .csv or .json) or a JSON body
+        ([{...}, ...] or {"users": [...]}) with username, password, email and
+        rfid_tag per user. Valid rows are created, the rest reported per row
+        (see api/imports.py).
+
+        Uploads with at most USER_IMPORT_INLINE_PASSWORDS passwords are imported
+        right away (201). Larger ones would hash passwords for longer than a
+        request may take: they are queued as a UserImportJob (202) for the
+        `import_users --queued` worker, and polled at /api/users/import/<id>/.
+        More than USER_IMPORT_MAX_ROWS rows is refused with 413.
+        """
+        upload = request.FILES.get('file')
+        try:
+            if upload is not None:
+                input_format = 'json' if upload.name.lower().endswith('.json') else 'csv'
+                rows = parse_import(upload.read(), input_format)
+            else:
+                rows = parse_import(request.data, 'json')
+        except (ValueError, UnicodeDecodeError) as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if len(rows) > settings.USER_IMPORT_MAX_ROWS:
+            return Response({
+                "error": f"Too many rows ({len(rows)}; at most {settings.USER_IMPORT_MAX_ROWS}). "
+                         "Split the file or run `manage.py import_users` on the server.",
+            }, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        if count_passwords(rows) > settings.USER_IMPORT_INLINE_PASSWORDS:
+            job = queue_import(rows, created_by=request.user)
+            return Response(UserImportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+        # Few enough hashes to do here, in this process (no pool on the request path)
+        result = import_users(rows, chunk_size=settings.USER_IMPORT_CHUNK_SIZE, workers=1)
+        if result["created"]:
+            status_code = status.HTTP_201_CREATED
+        elif result["errors"]:
+            status_code = status.HTTP_400_BAD_REQUEST
+        else:
+            status_code = status.HTTP_200_OK
+        return Response(result, status=status_code)
 
-class AdminRentalLogView(APIView):
+    @action(detail=False, methods=['get'], url_path=r'import/(?P<job_id>[0-9]+)')
+    def import_status(self, request, job_id=None):
+        """GET /api/users/import/<id>/ — status and per-row errors of a queued import"""
+        job = UserImportJob.objects.filter(pk=job_id).first()
+        if job is None:
+            return Response({"error": "Import job not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(UserImportJobSerializer(job).data)
+
+
+class AdminRentalLogView(RentalLogFilterMixin, APIView):
     """
     Admin-only view for managing rental logs:
-    - GET: Fetch all rental logs
+    - GET: Fetch rental logs (cursor-paginated, see RentalLogFilterMixin)
     - PATCH: Update rental status
     - DELETE: Delete a rental log
     """
     permission_classes = [IsAuthenticated, IsAdminUser]
 
     def get(self, request):
-        """Fetch all rental logs"""
-        rentals = RentalLog.objects.select_related('user', 'bicycle').order_by('-start_time')
-        serializer = RentalLogSerializer(rentals, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        """Fetch rental logs, one page at a time"""
+        return self.paginated_rentals(RentalLog.objects.all())
 
     def patch(self, request, pk=None):
         """Update rental status"""
@@ -271,11 +723,20 @@ class AdminRentalLogView(APIView):
         if new_status not in ['ongoing', 'completed']:
             return Response({"error": "Invalid status value."}, status=status.HTTP_400_BAD_REQUEST)
 
-        rental.status = new_status
-        if new_status == 'completed':
-            rental.complete()
-        else:
-            rental.save()
+        try:
+            with transaction.atomic():
+                before = contribution(rental)
+                rental.status = new_status
+                if new_status == 'completed':
+                    rental.complete()
+                else:
+                    rental.save()
+                record_rental_change(before, contribution(rental))
+        except IntegrityError:
+            return Response(
+                {"error": "This user or bicycle already has an ongoing rental."},
+                status=status.HTTP_409_CONFLICT,
+            )
 
         return Response(
             {"message": f"Rental {rental.id} updated successfully.", "status": rental.status},
@@ -293,8 +754,34 @@ class AdminRentalLogView(APIView):
         except RentalLog.DoesNotExist:
             raise NotFound("Rental log not found.")
 
-        rental.delete()
+        with transaction.atomic():
+            record_rental_change(contribution(rental), None)
+            rental.delete()
         return Response({"message": f"Rental log {rental_id} deleted successfully."}, status=status.HTTP_200_OK)
+
+
+class AdminRentalExportView(RentalLogFilterMixin, APIView):
+    """
+    GET /api/admin/rentals/export/?output=csv|ndjson
+    Streams every matching rental log (oldest first) with the same filters as
+    the rental log list. (`output`, because DRF reserves `?format=`.) Under
+    ASGI the chunks are handed over as an async iterator, see aiter_chunks.
+    """
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def get(self, request):
+        output = request.query_params.get('output', 'csv')
+        if output not in EXPORT_FORMATS:
+            return Response({"error": "'output' must be 'csv' or 'ndjson'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        rentals = self.filter_rentals(RentalLog.objects.all())
+        chunks = export_rentals(rentals, output=output, chunk_size=settings.RENTAL_EXPORT_CHUNK_SIZE)
+        if isinstance(request._request, ASGIRequest):
+            chunks = aiter_chunks(chunks)
+        response = StreamingHttpResponse(chunks, content_type=EXPORT_FORMATS[output])
+        filename = f"rentals-{timezone.now():%Y%m%d-%H%M%S}.{output}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
     
 
 
@@ -309,21 +796,24 @@ from django.db import transaction
 # -------------------------------
 # User Rental APIs (For Normal Users)
 # -------------------------------
-class UserRentalAPIView(APIView):
+class UserRentalAPIView(FleetSyncMixin, IdempotencyMixin, APIView):
     """
     Normal User:
-    - GET    /api/user/bicycles/   → Fetch available bikes
+    - GET    /api/user/bicycles/   → Fetch available bikes (supports ?since= and ETags)
     - POST   /api/user/rentals/    → Start or complete ride
     """
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         """Fetch only AVAILABLE bicycles"""
-        bikes = Bicycle.objects.filter(status="available").order_by("device_id")
-        serializer = BicycleSerializer(bikes, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        def build_response():
+            bikes = Bicycle.objects.filter(status="available").order_by("device_id")
+            serializer = BicycleSerializer(bikes, many=True)
+            return Response(serializer.data, status=status.HTTP_200_OK)
+
+        return self.fleet_response(request, build_response)
 
-    @transaction.atomic
     def post(self, request, *args, **kwargs):
         """
         POST body should contain:
@@ -333,8 +823,16 @@ class UserRentalAPIView(APIView):
             "rental_id": "<id>"        # required for complete
         }
 
-        Note: distance_km is NOT expected/handled in the request or response.
+        Note: distance_km is not taken from the request; on completion it is
+        computed from the bike's telemetry trace during the ride.
+        Both actions use conditional UPDATEs instead of row locks (see api/rides.py).
+
+        Send an Idempotency-Key header to make retries safe: a repeated request
+        with the same key gets the original response back.
         """
+        return self.idempotent_response(request, lambda: self.ride_action(request))
+
+    def ride_action(self, request):
         user = request.user
         action = request.data.get("action")
 
@@ -350,45 +848,10 @@ class UserRentalAPIView(APIView):
             if not device_id:
                 return Response({"error": "'device_id' is required."}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Check if user already has an ongoing ride
-            if RentalLog.objects.filter(user=user, status="ongoing").exists():
-                return Response(
-                    {"error": "You already have an ongoing ride."},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-
-            # Try to fetch available bike and lock it (prevent race conditions)
             try:
-                bicycle = Bicycle.objects.select_for_update().get(device_id=device_id, status="available")
-            except Bicycle.DoesNotExist:
-                return Response(
-                    {"error": f"Bicycle '{device_id}' not available or not found."},
-                    status=status.HTTP_404_NOT_FOUND,
-                )
-
-            # Create rental log entry (start_time auto-set by model's auto_now_add, but we set explicitly to be safe)
-            rental = RentalLog.objects.create(
-                user=user,
-                bicycle=bicycle,
-                start_time=timezone.now(),
-                status="ongoing",
-            )
-
-            # Update bike status
-            bicycle.status = "in_use"
-            bicycle.save(update_fields=["status"])
-
-            return Response(
-                {
-                    "message": f"Ride started successfully for bike {bicycle.device_id}.",
-                    "rental_id": rental.id,
-                    "bike_id": bicycle.device_id,
-                    "user": user.username,
-                    "status": rental.status,
-                    "start_time": rental.start_time,
-                },
-                status=status.HTTP_201_CREATED,
-            )
+                return Response(start_ride(user, device_id), status=status.HTTP_201_CREATED)
+            except RideError as e:
+                return Response({"error": e.message}, status=e.status_code)
 
         # ------------- COMPLETE RIDE -------------
         elif action == "complete":
@@ -399,39 +862,10 @@ class UserRentalAPIView(APIView):
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            # Find ongoing rental and lock it
             try:
-                rental = RentalLog.objects.select_for_update().select_related("bicycle").get(
-                    id=rental_id, user=user, status="ongoing"
-                )
-            except RentalLog.DoesNotExist:
-                return Response(
-                    {"error": "No ongoing ride found with this rental_id."},
-                    status=status.HTTP_404_NOT_FOUND,
-                )
-
-            # Mark rental as completed and update timing (no distance_km)
-            rental.complete()  # call without distance_km
-
-            # Set bicycle available again
-            bicycle = rental.bicycle
-            bicycle.status = "available"
-            bicycle.save(update_fields=["status"])
-
-            # Ensure rental fields are saved (end_time, duration_minutes, status)
-            rental.save(update_fields=["end_time", "duration_minutes", "status"])
-
-            return Response(
-                {
-                    "message": f"Ride completed successfully for bike {bicycle.device_id}.",
-                    "rental_id": rental.id,
-                    "bike_id": bicycle.device_id,
-                    "duration_minutes": rental.duration_minutes,
-                    "end_time": rental.end_time,
-                    "status": rental.status,
-                },
-                status=status.HTTP_200_OK,
-            )
+                return Response(complete_ride(user, rental_id), status=status.HTTP_200_OK)
+            except RideError as e:
+                return Response({"error": e.message}, status=e.status_code)
 
         # ------------- INVALID ACTION -------------
         else:
@@ -441,27 +875,135 @@ class UserRentalAPIView(APIView):
             )
 
 
+class RfidTapView(IdempotencyMixin, APIView):
+    """
+    POST /api/rfid/tap/   (kiosk / bike lock, device-authenticated)
+    Headers: Authorization: Bearer <RFID_DEVICE_TOKEN>
+    Body:    {"rfid_tag": "<tag>", "device_id": "<bike_id>", "action": "start" | "complete" (optional)}
+
+    Without an action, tapping a bike starts a ride for the tag's owner and
+    tapping the bike of their ongoing ride completes it, but only once the
+    ride is RFID_TAP_MIN_RIDE_SECONDS old: a double tap or reader retry right
+    after the start is answered with "action": "none" instead of ending the
+    ride. Readers that know the intent send it as "action". Same ride logic as
+    /api/user/rentals/, and Idempotency-Key is honoured the same way.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def post(self, request, *args, **kwargs):
+        token = request.headers.get("Authorization", "")
+        expected = f"Bearer {settings.RFID_DEVICE_TOKEN}"
+        if not settings.RFID_DEVICE_TOKEN or not hmac.compare_digest(token.encode(), expected.encode()):
+            return Response({"error": "Unauthorized"}, status=status.HTTP_401_UNAUTHORIZED)
+        return self.idempotent_response(request, lambda: self.tap(request))
+
+    def idempotency_scope(self, request):
+        # No request.user here: scope keys by the device credential and the reader's bike
+        device = f'{request.headers.get("Authorization", "")} {request.data.get("device_id")}'
+        return f"device:{_digest(device)[:32]}"
+
+    def tap(self, request):
+        tag = str(request.data.get("rfid_tag") or "").strip()
+        device_id = request.data.get("device_id")
+        action = request.data.get("action")
+        if not tag or not device_id:
+            return Response({"error": "'rfid_tag' and 'device_id' are required."}, status=status.HTTP_400_BAD_REQUEST)
+        if action not in (None, "start", "complete"):
+            return Response({"error": "Invalid 'action'. Use 'start' or 'complete'."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        owner = rfid_tags.lookup(tag)
+        if owner is None:
+            return Response({"error": "Unknown RFID tag."}, status=status.HTTP_404_NOT_FOUND)
+        if not owner.is_active:
+            return Response({"error": "This account is disabled."}, status=status.HTTP_403_FORBIDDEN)
+        user = User(id=owner.user_id, username=owner.username)
+
+        ongoing = (
+            RentalLog.objects
+            .filter(user_id=owner.user_id, status="ongoing")
+            .values_list("id", "bicycle__device_id", "start_time")
+            .first()
+        )
+        try:
+            if ongoing is None:
+                if action == "complete":
+                    return Response({"error": "No ongoing ride to complete."}, status=status.HTTP_404_NOT_FOUND)
+                return Response({"action": "start", **start_ride(user, device_id)}, status=status.HTTP_201_CREATED)
+            if action == "start":
+                return Response({"error": "You already have an ongoing ride."}, status=status.HTTP_400_BAD_REQUEST)
+
+            rental_id, ride_device_id, start_time = ongoing
+            if ride_device_id != device_id:
+                return Response(
+                    {"error": f"You already have an ongoing ride on bike {ride_device_id}."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            ride_seconds = (timezone.now() - start_time).total_seconds()
+            if action is None and ride_seconds < settings.RFID_TAP_MIN_RIDE_SECONDS:
+                return Response({
+                    "action": "none",
+                    "message": f"Ride on bike {device_id} started {ride_seconds:.0f}s ago; "
+                               f"tap again after {settings.RFID_TAP_MIN_RIDE_SECONDS}s to end it.",
+                    "rental_id": rental_id,
+                    "bike_id": device_id,
+                    "status": "ongoing",
+                }, status=status.HTTP_200_OK)
+
+            return Response({"action": "complete", **complete_ride(user, rental_id)}, status=status.HTTP_200_OK)
+        except RideError as e:
+            return Response({"error": e.message}, status=e.status_code)
+
+
+class NearestBicycleAPIView(APIView):
+    """
+    GET /api/user/bicycles/nearest/?lat=<lat>&lon=<lon>&k=<count>&radius=<metres>
+    Returns the k available bikes closest to (lat, lon) within radius, closest
+    first, each with its distance_m. Served from the in-process grid index.
+    """
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            latitude = float(request.query_params["lat"])
+            longitude = float(request.query_params["lon"])
+        except (KeyError, ValueError):
+            return Response({"error": "'lat' and 'lon' query parameters are required numbers."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            return Response({"error": "'lat'/'lon' out of range."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            k = int(request.query_params.get("k", 5))
+            radius = float(request.query_params.get("radius", 2000))
+        except ValueError:
+            return Response({"error": "'k' and 'radius' must be numbers."}, status=status.HTTP_400_BAD_REQUEST)
+
+        k = max(1, min(k, settings.NEAREST_MAX_K))
+        radius = max(0.0, min(radius, settings.NEAREST_MAX_RADIUS_M))
+
+        bikes = available_bikes.nearest(latitude, longitude, k, radius)
+        return Response(bikes, status=status.HTTP_200_OK)
+
+
 # -------------------------------
 # User Rental History API (For Normal Users)
 # -------------------------------
-class UserRentalHistoryAPIView(APIView):
+class UserRentalHistoryAPIView(RentalLogFilterMixin, APIView):
     """
     Authenticated non-admin user can view their rental history (completed and ongoing)
-    GET /api/user/rentals/history/
+    GET /api/user/rentals/history/  (cursor-paginated, newest first, see RentalLogFilterMixin)
     """
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        user = request.user
-
-        # Fetch all rental logs for this user (ordered by latest start_time)
-        user_rentals = RentalLog.objects.filter(user=user).select_related("bicycle").order_by("-start_time")
-
-        if not user_rentals.exists():
-            return Response({"message": "No rental history found."}, status=status.HTTP_200_OK)
-
-        serializer = RentalLogSerializer(user_rentals, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        user_rentals = RentalLog.objects.filter(user_id=request.user.id)
+        return self.paginated_rentals(user_rentals)
 
 
 # -------------------------------
@@ -490,3 +1032,64 @@ class UserProfileDetailAPIView(APIView):
             "registered_date": profile.registered_date
         }
         return Response(data, status=status.HTTP_200_OK)
+
+
+
+# -------------------------------
+# Live bicycle stream (Server-Sent Events, ASGI only)
+# -------------------------------
+async def bicycle_stream(request):
+    """
+    GET /api/stream/bicycles/?token=<access token>
+    Server-Sent Events stream of changed bikes (id, device_id, status,
+    latitude, longitude, last_update) as "bicycles" events. Reconnecting with
+    the Last-Event-ID header (or ?last_event_id=) first replays every change
+    since that event. The token may also be sent as "Authorization: Bearer".
+
+    Needs the ASGI application (backend/asgi.py); a WSGI worker would block on
+    the never-ending response, so the request is refused there.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({"error": "The bicycle stream is only served by the ASGI application."},
+                            status=status.HTTP_501_NOT_IMPLEMENTED)
+
+    auth = CachedJWTAuthentication()
+    header = auth.get_header(request)
+    raw_token = auth.get_raw_token(header) if header else request.GET.get("token")
+    if not raw_token:
+        return JsonResponse({"error": "Authentication credentials were not provided."},
+                            status=status.HTTP_401_UNAUTHORIZED)
+    try:
+        validated_token = auth.get_validated_token(raw_token)
+        await sync_to_async(auth.get_user)(validated_token)
+    except (InvalidToken, AuthenticationFailed) as exc:
+        return JsonResponse({"error": str(exc)}, status=status.HTTP_401_UNAUTHORIZED)
+
+    last_event_id = request.headers.get("Last-Event-ID") or request.GET.get("last_event_id")
+    resume_from = parse_datetime(last_event_id) if last_event_id else None
+
+    async def events():
+        queue = change_feed.subscribe()
+        try:
+            yield "retry: 2000\n\n"
+            if resume_from is not None:
+                backlog = await sync_to_async(changed_bicycles, thread_sensitive=False)(resume_from)
+                if backlog:
+                    yield format_event(backlog)
+
+            while True:
+                try:
+                    bikes = await asyncio.wait_for(queue.get(), timeout=settings.BICYCLE_STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if bikes is None:
+                    return
+                yield format_event(bikes)
+        finally:
+            change_feed.unsubscribe(queue)
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -4,6 +4,7 @@ from datetime import timedelta
 from dotenv import load_dotenv
 import os 
 import dj_database_url
+from corsheaders.defaults import default_headers
 
 
 # Load environment variables from .env (locally only)
@@ -162,4 +163,119 @@ CORS_ALLOWED_ORIGINS = [
     "http://localhost:8080",
     "http://127.0.0.1:8080",
     "https://cycle-rent-lora.vercel.app",
-]
\ No newline at end of file
+]
+
+# Let browser clients read the delta-sync headers of the bicycle list endpoints
+CORS_EXPOSE_HEADERS = ["ETag", "X-Sync-Cursor", "Idempotent-Replayed"]
+CORS_ALLOW_HEADERS = (*default_headers, "idempotency-key")
+
+
+# EnthuTech webhook ingestion
+WEBHOOK_MAX_BATCH_SIZE = int(os.environ.get("WEBHOOK_MAX_BATCH_SIZE", "1000"))
+# Moves shorter than this are GPS jitter: only the heartbeat (last_update) is refreshed,
+# and at most once per WEBHOOK_HEARTBEAT_INTERVAL seconds
+WEBHOOK_MOVE_THRESHOLD_M = float(os.environ.get("WEBHOOK_MOVE_THRESHOLD_M", "15"))
+WEBHOOK_HEARTBEAT_INTERVAL = int(os.environ.get("WEBHOOK_HEARTBEAT_INTERVAL", "60"))
+
+# "sync" writes uplinks inside the request; "queue" validates, enqueues and answers 202;
+# "coalesce" keeps only the newest position per device and flushes them periodically
+WEBHOOK_INGEST_MODE = os.environ.get("WEBHOOK_INGEST_MODE", "sync")
+WEBHOOK_QUEUE_MAXSIZE = int(os.environ.get("WEBHOOK_QUEUE_MAXSIZE", "20000"))
+WEBHOOK_QUEUE_BATCH_SIZE = int(os.environ.get("WEBHOOK_QUEUE_BATCH_SIZE", "500"))
+WEBHOOK_QUEUE_FLUSH_INTERVAL = float(os.environ.get("WEBHOOK_QUEUE_FLUSH_INTERVAL", "1.0"))
+WEBHOOK_QUEUE_WORKERS = int(os.environ.get("WEBHOOK_QUEUE_WORKERS", "2"))
+WEBHOOK_QUEUE_PUT_TIMEOUT = float(os.environ.get("WEBHOOK_QUEUE_PUT_TIMEOUT", "0.5"))
+WEBHOOK_COALESCE_MAX_DEVICES = int(os.environ.get("WEBHOOK_COALESCE_MAX_DEVICES", "1000"))
+WEBHOOK_COALESCE_FLUSH_INTERVAL = float(os.environ.get("WEBHOOK_COALESCE_FLUSH_INTERVAL", "2.0"))
+
+# In-process device_id -> Bicycle registry used by the webhook
+DEVICE_REGISTRY_MAX_SIZE = int(os.environ.get("DEVICE_REGISTRY_MAX_SIZE", "50000"))
+DEVICE_REGISTRY_TTL = int(os.environ.get("DEVICE_REGISTRY_TTL", "300"))
+DEVICE_REGISTRY_NEGATIVE_TTL = int(os.environ.get("DEVICE_REGISTRY_NEGATIVE_TTL", "30"))
+
+# Position history (BicycleTelemetry) and its retention, see `manage.py prune_telemetry`
+TELEMETRY_ENABLED = os.environ.get("TELEMETRY_ENABLED", "True") == "True"
+TELEMETRY_RETENTION_DAYS = int(os.environ.get("TELEMETRY_RETENTION_DAYS", "90"))
+TELEMETRY_DOWNSAMPLE_AFTER_DAYS = int(os.environ.get("TELEMETRY_DOWNSAMPLE_AFTER_DAYS", "7"))
+TELEMETRY_DOWNSAMPLE_SECONDS = int(os.environ.get("TELEMETRY_DOWNSAMPLE_SECONDS", "60"))
+# Ride distance ignores trace segments faster than this (GPS glitches / teleports)
+RIDE_MAX_SPEED_KMH = float(os.environ.get("RIDE_MAX_SPEED_KMH", "40"))
+
+# In-process grid index behind /api/user/bicycles/nearest/
+NEAREST_GRID_CELL_DEG = float(os.environ.get("NEAREST_GRID_CELL_DEG", "0.005"))
+NEAREST_INDEX_TTL = int(os.environ.get("NEAREST_INDEX_TTL", "60"))
+NEAREST_MAX_K = int(os.environ.get("NEAREST_MAX_K", "50"))
+NEAREST_MAX_RADIUS_M = float(os.environ.get("NEAREST_MAX_RADIUS_M", "20000"))
+
+# /api/bicycles/?zoom= below this returns clusters instead of individual bikes
+BICYCLE_CLUSTER_MAX_ZOOM = int(os.environ.get("BICYCLE_CLUSTER_MAX_ZOOM", "15"))
+
+# /api/stream/bicycles/ (Server-Sent Events, served by backend/asgi.py).
+# BICYCLE_STREAM_LOOKBACK also sets how far back the ?since= delta cursor re-reads.
+BICYCLE_STREAM_POLL_INTERVAL = float(os.environ.get("BICYCLE_STREAM_POLL_INTERVAL", "0.5"))
+BICYCLE_STREAM_LOOKBACK = float(os.environ.get("BICYCLE_STREAM_LOOKBACK", "2"))
+BICYCLE_STREAM_QUEUE_SIZE = int(os.environ.get("BICYCLE_STREAM_QUEUE_SIZE", "100"))
+BICYCLE_STREAM_KEEPALIVE = float(os.environ.get("BICYCLE_STREAM_KEEPALIVE", "15"))
+
+# Shared cache for the dashboard sections, idempotency keys and user state (locmem per process by default).
+# Set REDIS_URL (and install the `redis` package) so all workers share one cache.
+if os.environ.get("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["REDIS_URL"],
+        }
+    }
+
+# Dashboard sections are served from the cache for DASHBOARD_CACHE_TTL seconds (or until
+# invalidated); an older copy is kept for DASHBOARD_CACHE_STALE_TTL to serve while recomputing
+DASHBOARD_CACHE_TTL = int(os.environ.get("DASHBOARD_CACHE_TTL", "30"))
+DASHBOARD_CACHE_STALE_TTL = int(os.environ.get("DASHBOARD_CACHE_STALE_TTL", "600"))
+DASHBOARD_CACHE_LOCK_TIMEOUT = float(os.environ.get("DASHBOARD_CACHE_LOCK_TIMEOUT", "10"))
+
+# Cursor pagination of the rental log endpoints (?page_size= up to RENTAL_MAX_PAGE_SIZE)
+RENTAL_PAGE_SIZE = int(os.environ.get("RENTAL_PAGE_SIZE", "50"))
+RENTAL_MAX_PAGE_SIZE = int(os.environ.get("RENTAL_MAX_PAGE_SIZE", "500"))
+# Rows fetched per round trip by /api/admin/rentals/export/ and `manage.py export_rentals`
+RENTAL_EXPORT_CHUNK_SIZE = int(os.environ.get("RENTAL_EXPORT_CHUNK_SIZE", "2000"))
+
+# Idempotency-Key on POST /api/user/rentals/: responses are replayed for IDEMPOTENCY_KEY_TTL
+# seconds; a request still running after IDEMPOTENCY_PENDING_TIMEOUT seconds is forgotten
+IDEMPOTENCY_KEY_TTL = int(os.environ.get("IDEMPOTENCY_KEY_TTL", "3600"))
+IDEMPOTENCY_PENDING_TIMEOUT = int(os.environ.get("IDEMPOTENCY_PENDING_TIMEOUT", "30"))
+
+# POST /api/rfid/tap/ (kiosks / bike locks): shared device token, sent as "Authorization: Bearer <token>".
+# The endpoint rejects every request while the token is unset.
+RFID_DEVICE_TOKEN = os.environ.get("RFID_DEVICE_TOKEN", "")
+RFID_TAG_CACHE_SIZE = int(os.environ.get("RFID_TAG_CACHE_SIZE", "50000"))
+RFID_TAG_CACHE_TTL = int(os.environ.get("RFID_TAG_CACHE_TTL", "300"))
+RFID_TAG_NEGATIVE_TTL = int(os.environ.get("RFID_TAG_NEGATIVE_TTL", "5"))
+# A tap without an explicit "action" only ends a ride this many seconds after it started
+# (repeated taps and reader retries right after the start are ignored)
+RFID_TAP_MIN_RIDE_SECONDS = int(os.environ.get("RFID_TAP_MIN_RIDE_SECONDS", "30"))
+
+# Reservations hold a bike for RESERVATION_HOLD_MINUTES; `manage.py expire_reservations --loop`
+# releases expired holds, waking at the next expiry or every RESERVATION_SWEEP_INTERVAL seconds
+RESERVATION_HOLD_MINUTES = int(os.environ.get("RESERVATION_HOLD_MINUTES", "10"))
+RESERVATION_SWEEP_INTERVAL = float(os.environ.get("RESERVATION_SWEEP_INTERVAL", "5"))
+RESERVATION_SWEEP_BATCH_SIZE = int(os.environ.get("RESERVATION_SWEEP_BATCH_SIZE", "1000"))
+
+# Available bikes not heard from for DEVICE_OFFLINE_AFTER seconds are marked offline by
+# `manage.py mark_offline_devices [--loop]`; keep it well above WEBHOOK_HEARTBEAT_INTERVAL
+DEVICE_OFFLINE_AFTER = int(os.environ.get("DEVICE_OFFLINE_AFTER", "900"))
+DEVICE_OFFLINE_SWEEP_INTERVAL = float(os.environ.get("DEVICE_OFFLINE_SWEEP_INTERVAL", "60"))
+
+# High-frequency endpoints authenticate with api.authentication.CachedJWTAuthentication:
+# a user's active/staff flags are read from the cache and re-checked every AUTH_USER_CACHE_TTL seconds
+AUTH_USER_CACHE_TTL = int(os.environ.get("AUTH_USER_CACHE_TTL", "60"))
+
+# Bulk user import (POST /api/users/import/, `manage.py import_users`): rows per INSERT and
+# processes hashing passwords in the import worker / command (0 = one per CPU)
+USER_IMPORT_CHUNK_SIZE = int(os.environ.get("USER_IMPORT_CHUNK_SIZE", "1000"))
+USER_IMPORT_WORKERS = int(os.environ.get("USER_IMPORT_WORKERS", "0"))
+# POST /api/users/import/ hashes at most USER_IMPORT_INLINE_PASSWORDS passwords in the request
+# (~0.4 s each); larger uploads, up to USER_IMPORT_MAX_ROWS rows, are queued for the
+# `import_users --queued --loop` worker, which polls every USER_IMPORT_POLL_INTERVAL seconds
+USER_IMPORT_INLINE_PASSWORDS = int(os.environ.get("USER_IMPORT_INLINE_PASSWORDS", "8"))
+USER_IMPORT_MAX_ROWS = int(os.environ.get("USER_IMPORT_MAX_ROWS", "20000"))
+USER_IMPORT_POLL_INTERVAL = float(os.environ.get("USER_IMPORT_POLL_INTERVAL", "5"))
@@ -3,4 +3,11 @@ import { twMerge } from "tailwind-merge";
 
 export function cn(...inputs: ClassValue[]) {
   return twMerge(clsx(inputs));
-}
\ No newline at end of file
+}
+// The `cursor` param of a DRF cursor-pagination `next` URL. The absolute URL
+// itself may carry the wrong scheme/host behind a proxy, so pages re-request
+// their own endpoint with just this param.
+export function cursorFrom(next: string | null | undefined): string | null {
+  if (!next) return null;
+  return new URL(next, window.location.origin).searchParams.get("cursor");
+}
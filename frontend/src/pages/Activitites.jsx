@@ -5,22 +5,21 @@ import Layout from "../components/Layout";
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card";
 import { Badge } from "@/components/ui/badge";
 import { Clock, Bike } from "lucide-react";
+import { cursorFrom } from "@/lib/utils";
 
 const Activities = () => {
   const navigate = useNavigate();
   const [rides, setRides] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
 
-  // Fetch rental history
+  // Fetch rental history (paginated, newest first)
   useEffect(() => {
     const fetchRides = async () => {
       try {
         const response = await api.get("/api/user/rentals/history/");
-        if (Array.isArray(response.data)) {
-          setRides(response.data);
-        } else if (response.data?.message) {
-          setRides([]); // handle "No rental history found"
-        }
+        setRides(response.data?.results || []);
+        setNextCursor(cursorFrom(response.data?.next));
       } catch (error) {
         console.error("Error fetching rental history:", error);
         setRides([]);
@@ -32,6 +31,16 @@ const Activities = () => {
     fetchRides();
   }, []);
 
+  const loadMore = async () => {
+    try {
+      const response = await api.get("/api/user/rentals/history/", { params: { cursor: nextCursor } });
+      setRides((prev) => [...prev, ...(response.data?.results || [])]);
+      setNextCursor(cursorFrom(response.data?.next));
+    } catch (error) {
+      console.error("Error fetching more rides:", error);
+    }
+  };
+
   // Format datetime
   const formatDate = (isoString) => {
     if (!isoString) return "—";
@@ -133,6 +142,14 @@ const Activities = () => {
                 </CardContent>
               </Card>
             ))}
+            {nextCursor && (
+              <button
+                onClick={loadMore}
+                className="w-full py-2 text-sm font-medium text-primary hover:underline"
+              >
+                Load more rides
+              </button>
+            )}
           </div>
         )}
       </div>
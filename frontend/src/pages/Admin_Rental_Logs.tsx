@@ -21,6 +21,7 @@ import {
 } from '@/components/ui/select';
 import { toast } from '@/components/ui/use-toast';
 import api from '@/api';
+import { cursorFrom } from '@/lib/utils';
 
 // ===================== Types =====================
 
@@ -50,13 +51,22 @@ interface RentalLog {
   status: 'ongoing' | 'completed';
 }
 
+interface RentalLogPage {
+  next: string | null;
+  previous: string | null;
+  results: RentalLog[];
+}
+
 // ===================== Component =====================
 
 export default function Admin_Rental_Logs() {
   const [logs, setLogs] = useState<RentalLog[]>([]);
   const [search, setSearch] = useState('');
+  const [searchFilter, setSearchFilter] = useState('');
   const [statusFilter, setStatusFilter] = useState<'all' | 'ongoing' | 'completed'>('all');
   const [loading, setLoading] = useState<boolean>(true);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState<boolean>(false);
 
   // ✅ Helper function to format duration
   const formatDuration = (minutes: number | null): string => {
@@ -72,12 +82,22 @@ export default function Admin_Rental_Logs() {
     return `${mins}m`;
   };
 
-  // Fetch all rental logs
+  // Server-side filters, re-sent with every page (the cursor only holds the position)
+  const filterParams = () => {
+    const params: Record<string, string> = {};
+    if (statusFilter !== 'all') params.status = statusFilter;
+    if (searchFilter) params.search = searchFilter;
+    return params;
+  };
+
+  // Fetch the first page of rental logs (newest first), filtered server-side
   const fetchLogs = async () => {
+    const params = filterParams();
     try {
       setLoading(true);
-      const response = await api.get<RentalLog[]>('/api/admin/rentals/');
-      setLogs(response.data);
+      const response = await api.get<RentalLogPage>('/api/admin/rentals/', { params });
+      setLogs(response.data.results);
+      setNextCursor(cursorFrom(response.data.next));
     } catch (error) {
       console.error('Error fetching rental logs:', error);
       toast?.({ title: 'Error fetching logs', variant: 'destructive' });
@@ -86,6 +106,24 @@ export default function Admin_Rental_Logs() {
     }
   };
 
+  // Append the next page of rental logs
+  const fetchMore = async () => {
+    if (!nextCursor) return;
+    try {
+      setLoadingMore(true);
+      const response = await api.get<RentalLogPage>('/api/admin/rentals/', {
+        params: { ...filterParams(), cursor: nextCursor },
+      });
+      setLogs((prev) => [...prev, ...response.data.results]);
+      setNextCursor(cursorFrom(response.data.next));
+    } catch (error) {
+      console.error('Error fetching more rental logs:', error);
+      toast?.({ title: 'Error fetching logs', variant: 'destructive' });
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   // Update rental status
   const handleStatusUpdate = async (id: number, newStatus: string) => {
     try {
@@ -111,18 +149,16 @@ export default function Admin_Rental_Logs() {
     }
   };
 
+  // Debounce the search box so typing does not send a request per keystroke
   useEffect(() => {
-    fetchLogs();
-  }, []);
+    const timer = setTimeout(() => setSearchFilter(search.trim()), 300);
+    return () => clearTimeout(timer);
+  }, [search]);
 
-  // Filter logs
-  const filteredLogs = logs.filter((log) => {
-    const matchesSearch =
-      log.user?.username?.toLowerCase().includes(search.toLowerCase()) ||
-      log.bicycle?.device_id?.toLowerCase().includes(search.toLowerCase());
-    const matchesStatus = statusFilter === 'all' || log.status === statusFilter;
-    return matchesSearch && matchesStatus;
-  });
+  // The next cursor belongs to the old filters: start again from the first page
+  useEffect(() => {
+    fetchLogs();
+  }, [statusFilter, searchFilter]);
 
   return (
     <div className="p-8 space-y-6 animate-fade-in">
@@ -182,8 +218,8 @@ export default function Admin_Rental_Logs() {
                     Loading rental logs...
                   </TableCell>
                 </TableRow>
-              ) : filteredLogs.length > 0 ? (
-                filteredLogs.map((log) => (
+              ) : logs.length > 0 ? (
+                logs.map((log) => (
                   <TableRow key={log.id} className="hover:bg-background/20 transition">
                     <TableCell className="font-medium">{log.user?.username || '-'}</TableCell>
                     <TableCell>
@@ -236,6 +272,15 @@ export default function Admin_Rental_Logs() {
             </TableBody>
           </Table>
         </div>
+
+        {nextCursor && !loading && (
+          <div className="flex justify-center mt-4">
+            <Button variant="outline" onClick={fetchMore} disabled={loadingMore}>
+              {loadingMore && <Loader2 className="w-4 h-4 animate-spin mr-2" />}
+              Load more
+            </Button>
+          </div>
+        )}
       </Card>
     </div>
   );